@@ -13,7 +13,6 @@ import os
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import PromptTemplate
-from langchain.chat_models import init_chat_model
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
 from langchain.tools import Tool
@@ -25,10 +24,11 @@ from case_analyzer import (
     extract_abstract,
     extract_relevant_facts,
     extract_rules_of_law,
-    extract_choice_of_law_issue,
     extract_courts_position,
     load_prompt,
 )
+from case_analyzer.choice_of_law_issue import extract_choice_of_law_issue
+from llm_handler.backends import get_backend
 from tools.demo_tool import echo_tool
 
 # 1. Load environment
@@ -36,7 +36,7 @@ load_dotenv()
 
 # 2. Initialize the model
 # Ensure OPENAI_API_KEY is set in your environment or .env file
-model = init_chat_model("gpt-4o-mini", model_provider="openai")
+model = get_backend("gpt-4o-mini").chat_model()
 
 # Placeholder for concepts - replace with actual concepts if available
 concepts = []
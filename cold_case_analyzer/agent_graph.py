@@ -13,7 +13,6 @@ import os
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import PromptTemplate
-from langchain.chat_models import init_chat_model
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
@@ -28,16 +27,17 @@ from case_analyzer import (
     extract_abstract,
     extract_relevant_facts,
     extract_rules_of_law,
-    extract_choice_of_law_issue,
     extract_courts_position,
     load_prompt,
 )
+from case_analyzer.choice_of_law_issue import extract_choice_of_law_issue
+from llm_handler.backends import get_backend
 
 # 1. Load environment
 load_dotenv()
 
 # 2. Initialize the model
-model = init_chat_model("gpt-4o-mini", model_provider="openai")
+model = get_backend("gpt-4o-mini").chat_model()
 concepts = []  # Placeholder for concepts
 
 # 3. Define Tool Input Schemas (as in agent.py)
@@ -1,11 +1,56 @@
+import asyncio
+import contextvars
 import os
+import threading
 import time
-from. col_section import extract_col_section
-from .abstracts import extract_abstract
-from .relevant_facts import extract_relevant_facts
-from .rules_of_law import extract_rules_of_law
-from .choice_of_law_issue import extract_choice_of_law_issue
-from .courts_position import extract_courts_position
+from concurrent.futures import ThreadPoolExecutor
+from. col_section import extract_col_section, aextract_col_section
+from .abstracts import extract_abstract, aextract_abstract
+from .relevant_facts import extract_relevant_facts, aextract_relevant_facts
+from .rules_of_law import extract_rules_of_law, aextract_rules_of_law
+from .choice_of_law_issue import (
+    classify_choice_of_law_issue,
+    aclassify_choice_of_law_issue,
+    extract_issue_for_classification,
+    aextract_issue_for_classification,
+)
+from .courts_position import extract_courts_position, aextract_courts_position
+from .fused_extraction import FUSED_FIELDS, extract_fused_fields, aextract_fused_fields
+from .passage_retrieval import PassageIndex
+from .concepts_format import concepts_prompt
+from .stage_store import fingerprint, stage_fingerprint, get_stage_store
+from config import (
+    FUSED_EXTRACTION,
+    PASSAGE_RETRIEVAL,
+    PASSAGE_MAX_TOKENS,
+    PASSAGE_CONTEXT_TOKENS,
+    INCREMENTAL_ANALYSIS,
+    COL_CHUNK_THRESHOLD_TOKENS,
+    COL_CHUNK_MAX_TOKENS,
+    COL_MAX_CANDIDATES,
+)
+from llm_handler.usage import usage_context
+
+
+# Stages that only need the CoL section and run next to the issue -> position chain
+PARALLEL_STAGES = 3
+
+# Stages that are given the passages selected for another stage
+TEXT_STAGES = {"classification": "choice_of_law_issue"}
+
+
+def _submit(executor, function, *args):
+    # Runs in a copy of the caller's context, so usage metrics keep the case id
+    context = contextvars.copy_context()
+    return executor.submit(context.run, function, *args)
+
+
+def format_duration(elapsed_time):
+    """Formats seconds as '1h 2m 3s 456ms'."""
+    hours, rem = divmod(elapsed_time, 3600)
+    minutes, seconds = divmod(rem, 60)
+    milliseconds = (seconds - int(seconds)) * 1000
+    return f"{int(hours)}h {int(minutes)}m {int(seconds)}s {int(milliseconds)}ms"
 
 
 def load_prompt(filename):
@@ -17,70 +62,391 @@ def load_prompt(filename):
 
 
 class CaseAnalyzer:
-    def __init__(self, text, quote, model, concepts):
+    def __init__(
+        self,
+        text,
+        quote,
+        model,
+        concepts,
+        fused_extraction=None,
+        passage_retrieval=None,
+        incremental=None,
+    ):
         self.text = text
         self.quote = quote
         self.model = model
         self.concepts = concepts
+        # None: use the FUSED_EXTRACTION / PASSAGE_RETRIEVAL / INCREMENTAL_ANALYSIS settings
+        self.fused_extraction = FUSED_EXTRACTION if fused_extraction is None else fused_extraction
+        self.passage_retrieval = (
+            PASSAGE_RETRIEVAL if passage_retrieval is None else passage_retrieval
+        )
+        self.incremental = INCREMENTAL_ANALYSIS if incremental is None else incremental
+        self._passage_index = None
+        self._passage_index_lock = threading.Lock()
+        # Fingerprints of the stages run so far (incremental analysis)
+        self._fingerprints = {}
+
+    def _stage_settings(self, stage):
+        # Configuration that changes a stage's output besides its prompt and model
+        if stage == "col_section":
+            return [COL_CHUNK_THRESHOLD_TOKENS, COL_CHUNK_MAX_TOKENS, COL_MAX_CANDIDATES]
+        if self.passage_retrieval:
+            text_stage = TEXT_STAGES.get(stage, stage)
+            return ["passages", PASSAGE_MAX_TOKENS, PASSAGE_CONTEXT_TOKENS.get(text_stage)]
+        return ["full text"]
+
+    def _stage_id(self, stage, prompts, upstream, settings):
+        """Fingerprint of `stage` (remembered for the stages that depend on it)."""
+        stage_id = stage_fingerprint(
+            stage,
+            fingerprint(str(self.text)),
+            prompts,
+            self.model,
+            {
+                # Stages run without their upstream stage are keyed by its output
+                name: self._fingerprints.get(name) or fingerprint(output)
+                for name, output in upstream.items()
+            },
+            [self._stage_settings(stage), settings],
+        )
+        self._fingerprints[stage] = stage_id
+        return stage_id
+
+    def _run_stage(self, stage, prompts, upstream, compute, **settings):
+        """
+        Runs compute() for `stage`. With incremental analysis, the output is reused
+        when the decision, `prompts`, model, settings and the `upstream` stages
+        ({stage name: output}) are unchanged since it was stored.
+        """
+        if not self.incremental:
+            return compute()
+        stage_id = self._stage_id(stage, prompts, upstream, settings)
+        return get_stage_store().run(stage, stage_id, compute)
+
+    async def _arun_stage(self, stage, prompts, upstream, compute, **settings):
+        """Async counterpart of _run_stage(); `compute` is a coroutine function."""
+        if not self.incremental:
+            return await compute()
+        stage_id = self._stage_id(stage, prompts, upstream, settings)
+        return await get_stage_store().arun(stage, stage_id, compute)
+
+    def stage_text(self, stage, col_section):
+        """The decision text for `stage`: the full text, or its most relevant passages."""
+        if not self.passage_retrieval:
+            return self.text
+        with self._passage_index_lock:
+            if self._passage_index is None:
+                self._passage_index = PassageIndex(self.text, self.model)
+        return self._passage_index.context(stage, col_section)
 
     def get_col_section(self):
         prompt = load_prompt("col_section.txt")
-        return extract_col_section(self.text, prompt, self.model)
+        with usage_context(stage="col_section"):
+            return self._run_stage(
+                "col_section",
+                [prompt],
+                {},
+                lambda: extract_col_section(self.text, prompt, self.model),
+            )
 
     def get_abstract(self, col_section):
         prompt = load_prompt("abstract.txt")
-        return extract_abstract(self.text, col_section, prompt, self.model)
+        with usage_context(stage="abstract"):
+            return self._run_stage(
+                "abstract",
+                [prompt],
+                {"col_section": col_section},
+                lambda: extract_abstract(
+                    self.stage_text("abstract", col_section), col_section, prompt, self.model
+                ),
+            )
 
     def get_relevant_facts(self, col_section):
         prompt = load_prompt("facts.txt")
-        return extract_relevant_facts(self.text, col_section, prompt, self.model)
+        with usage_context(stage="relevant_facts"):
+            return self._run_stage(
+                "relevant_facts",
+                [prompt],
+                {"col_section": col_section},
+                lambda: extract_relevant_facts(
+                    self.stage_text("relevant_facts", col_section), col_section, prompt, self.model
+                ),
+            )
 
     def get_rules_of_law(self, col_section):
         prompt = load_prompt("rules.txt")
-        return extract_rules_of_law(self.text, col_section, prompt, self.model)
+        with usage_context(stage="rules_of_law"):
+            return self._run_stage(
+                "rules_of_law",
+                [prompt],
+                {"col_section": col_section},
+                lambda: extract_rules_of_law(
+                    self.stage_text("rules_of_law", col_section), col_section, prompt, self.model
+                ),
+            )
+
+    def get_fused_extraction(self, col_section):
+        """
+        Abstract, relevant facts and PIL provisions from one structured call. Fields
+        that fail validation are extracted again with their single-stage prompt.
+        """
+        prompts = {field: load_prompt(filename) for field, filename in FUSED_FIELDS.items()}
+        with usage_context(stage="fused_extraction"):
+            fields = self._run_stage(
+                "fused_extraction",
+                list(prompts.values()),
+                {"col_section": col_section},
+                lambda: extract_fused_fields(
+                    self.stage_text("fused_extraction", col_section),
+                    col_section,
+                    prompts,
+                    self.model,
+                ),
+            )
+        fallbacks = {
+            "abstract": self.get_abstract,
+            "relevant_facts": self.get_relevant_facts,
+            "pil_provisions": self.get_rules_of_law,
+        }
+        for field, value in fields.items():
+            if value is None:
+                print(f"Fused extraction returned no valid '{field}', using the single-stage prompt")
+                fields[field] = fallbacks[field](col_section)
+        return fields
 
     def get_choice_of_law_issue(self, col_section):
         classification_prompt = load_prompt("issue_classification.txt")
         prompt = load_prompt("issue.txt")
-        classification, choice_of_law_issue = extract_choice_of_law_issue(
-            self.text,
-            col_section,
-            classification_prompt,
-            prompt,
-            self.model,
-            self.concepts,
-        )
+        concepts = fingerprint(concepts_prompt(self.concepts))
+        with usage_context(stage="choice_of_law_issue"):
+            text = lambda: self.stage_text(TEXT_STAGES["classification"], col_section)
+            classification = self._run_stage(
+                "classification",
+                [classification_prompt],
+                {"col_section": col_section},
+                lambda: classify_choice_of_law_issue(
+                    text(), col_section, classification_prompt, self.model, self.concepts
+                ),
+                concepts=concepts,
+            )
+            choice_of_law_issue = self._run_stage(
+                "choice_of_law_issue",
+                [prompt],
+                {"col_section": col_section, "classification": classification},
+                lambda: extract_issue_for_classification(
+                    text(), col_section, prompt, self.model, self.concepts, classification
+                ),
+                concepts=concepts,
+            )
         return classification, choice_of_law_issue
 
     def get_courts_position(self, coli, col_section):
         prompt = load_prompt("position.txt")
-        return extract_courts_position(self.text, col_section, prompt, coli, self.model)
+        with usage_context(stage="courts_position"):
+            return self._run_stage(
+                "courts_position",
+                [prompt],
+                {"col_section": col_section, "choice_of_law_issue": coli},
+                lambda: extract_courts_position(
+                    self.stage_text("courts_position", col_section),
+                    col_section,
+                    prompt,
+                    coli,
+                    self.model,
+                ),
+            )
+
+    async def aget_col_section(self):
+        prompt = load_prompt("col_section.txt")
+        with usage_context(stage="col_section"):
+            return await self._arun_stage(
+                "col_section",
+                [prompt],
+                {},
+                lambda: aextract_col_section(self.text, prompt, self.model),
+            )
+
+    async def aget_abstract(self, col_section):
+        prompt = load_prompt("abstract.txt")
+        with usage_context(stage="abstract"):
+            return await self._arun_stage(
+                "abstract",
+                [prompt],
+                {"col_section": col_section},
+                lambda: aextract_abstract(
+                    self.stage_text("abstract", col_section), col_section, prompt, self.model
+                ),
+            )
+
+    async def aget_relevant_facts(self, col_section):
+        prompt = load_prompt("facts.txt")
+        with usage_context(stage="relevant_facts"):
+            return await self._arun_stage(
+                "relevant_facts",
+                [prompt],
+                {"col_section": col_section},
+                lambda: aextract_relevant_facts(
+                    self.stage_text("relevant_facts", col_section), col_section, prompt, self.model
+                ),
+            )
+
+    async def aget_rules_of_law(self, col_section):
+        prompt = load_prompt("rules.txt")
+        with usage_context(stage="rules_of_law"):
+            return await self._arun_stage(
+                "rules_of_law",
+                [prompt],
+                {"col_section": col_section},
+                lambda: aextract_rules_of_law(
+                    self.stage_text("rules_of_law", col_section), col_section, prompt, self.model
+                ),
+            )
+
+    async def aget_fused_extraction(self, col_section):
+        prompts = {field: load_prompt(filename) for field, filename in FUSED_FIELDS.items()}
+        with usage_context(stage="fused_extraction"):
+            fields = await self._arun_stage(
+                "fused_extraction",
+                list(prompts.values()),
+                {"col_section": col_section},
+                lambda: aextract_fused_fields(
+                    self.stage_text("fused_extraction", col_section),
+                    col_section,
+                    prompts,
+                    self.model,
+                ),
+            )
+        fallbacks = {
+            "abstract": self.aget_abstract,
+            "relevant_facts": self.aget_relevant_facts,
+            "pil_provisions": self.aget_rules_of_law,
+        }
+        for field, value in fields.items():
+            if value is None:
+                print(f"Fused extraction returned no valid '{field}', using the single-stage prompt")
+                fields[field] = await fallbacks[field](col_section)
+        return fields
+
+    async def aget_choice_of_law_issue(self, col_section):
+        classification_prompt = load_prompt("issue_classification.txt")
+        prompt = load_prompt("issue.txt")
+        concepts = fingerprint(concepts_prompt(self.concepts))
+        with usage_context(stage="choice_of_law_issue"):
+            text = lambda: self.stage_text(TEXT_STAGES["classification"], col_section)
+            classification = await self._arun_stage(
+                "classification",
+                [classification_prompt],
+                {"col_section": col_section},
+                lambda: aclassify_choice_of_law_issue(
+                    text(), col_section, classification_prompt, self.model, self.concepts
+                ),
+                concepts=concepts,
+            )
+            choice_of_law_issue = await self._arun_stage(
+                "choice_of_law_issue",
+                [prompt],
+                {"col_section": col_section, "classification": classification},
+                lambda: aextract_issue_for_classification(
+                    text(), col_section, prompt, self.model, self.concepts, classification
+                ),
+                concepts=concepts,
+            )
+        return classification, choice_of_law_issue
+
+    async def aget_courts_position(self, coli, col_section):
+        prompt = load_prompt("position.txt")
+        with usage_context(stage="courts_position"):
+            return await self._arun_stage(
+                "courts_position",
+                [prompt],
+                {"col_section": col_section, "choice_of_law_issue": coli},
+                lambda: aextract_courts_position(
+                    self.stage_text("courts_position", col_section),
+                    col_section,
+                    prompt,
+                    coli,
+                    self.model,
+                ),
+            )
 
     def analyze(self):
-        """Runs all analysis methods and returns results in a dictionary."""
+        """
+        Runs all analysis methods and returns results in a dictionary.
+        Stages run as soon as their inputs are available: after the CoL section,
+        abstract, relevant facts and PIL provisions are extracted in worker threads
+        (in one fused call if enabled) while this thread runs classification ->
+        issue -> court's position.
+        """
         start_time = time.time()
         col_section = self.get_col_section()
-        classification, coli = self.get_choice_of_law_issue(col_section)
-        results = {
-            "Quote": col_section,
-            "Abstract": self.get_abstract(col_section),
-            "Relevant facts / Summary of the case": self.get_relevant_facts(col_section),
-            "PIL provisions": self.get_rules_of_law(col_section),
-            "Themes": classification,
-            "Choice of law issue": coli,
-            "Court's position": self.get_courts_position(coli, col_section),
-        }
+        with ThreadPoolExecutor(max_workers=PARALLEL_STAGES) as executor:
+            if self.fused_extraction:
+                fused = _submit(executor, self.get_fused_extraction, col_section)
+                extracted = lambda field: fused.result()[field]
+            else:
+                futures = {
+                    "abstract": _submit(executor, self.get_abstract, col_section),
+                    "relevant_facts": _submit(executor, self.get_relevant_facts, col_section),
+                    "pil_provisions": _submit(executor, self.get_rules_of_law, col_section),
+                }
+                extracted = lambda field: futures[field].result()
+            classification, coli = self.get_choice_of_law_issue(col_section)
+            courts_position = self.get_courts_position(coli, col_section)
+            results = {
+                "Quote": col_section,
+                "Abstract": extracted("abstract"),
+                "Relevant facts / Summary of the case": extracted("relevant_facts"),
+                "PIL provisions": extracted("pil_provisions"),
+                "Themes": classification,
+                "Choice of law issue": coli,
+                "Court's position": courts_position,
+            }
 
         end_time = time.time()
         elapsed_time = end_time - start_time
+        print(f"Analyze function execution time: {format_duration(elapsed_time)}")
+        return results
 
-        # Format the elapsed time
-        hours, rem = divmod(elapsed_time, 3600)
-        minutes, seconds = divmod(rem, 60)
-        milliseconds = (seconds - int(seconds)) * 1000
-        formatted_time = (
-            f"{int(hours)}h {int(minutes)}m {int(seconds)}s {int(milliseconds)}ms"
-        )
+    async def aanalyze(self):
+        """
+        Async counterpart of analyze() for running many cases on one event loop:
+        the same stages and dependencies, with the independent stages awaited
+        concurrently instead of in worker threads.
+        """
+        start_time = time.time()
+        col_section = await self.aget_col_section()
 
-        print(f"Analyze function execution time: {formatted_time}")
+        async def issue_chain():
+            classification, coli = await self.aget_choice_of_law_issue(col_section)
+            return classification, coli, await self.aget_courts_position(coli, col_section)
+
+        if self.fused_extraction:
+            extracted, (classification, coli, courts_position) = await asyncio.gather(
+                self.aget_fused_extraction(col_section), issue_chain()
+            )
+        else:
+            abstract, relevant_facts, pil_provisions, (classification, coli, courts_position) = (
+                await asyncio.gather(
+                    self.aget_abstract(col_section),
+                    self.aget_relevant_facts(col_section),
+                    self.aget_rules_of_law(col_section),
+                    issue_chain(),
+                )
+            )
+            extracted = {
+                "abstract": abstract,
+                "relevant_facts": relevant_facts,
+                "pil_provisions": pil_provisions,
+            }
+        results = {
+            "Quote": col_section,
+            "Abstract": extracted["abstract"],
+            "Relevant facts / Summary of the case": extracted["relevant_facts"],
+            "PIL provisions": extracted["pil_provisions"],
+            "Themes": classification,
+            "Choice of law issue": coli,
+            "Court's position": courts_position,
+        }
+        print(f"Analyze function execution time: {format_duration(time.time() - start_time)}")
         return results
@@ -0,0 +1,168 @@
+from case_analyzer import load_prompt
+from case_analyzer.col_section import (
+    NO_SECTION,
+    build_col_section_prompt,
+    build_col_section_chunk_prompt,
+    build_col_section_merge_prompt,
+    chunk_decision,
+    select_candidates,
+)
+from case_analyzer.abstracts import build_abstract_prompt
+from case_analyzer.relevant_facts import build_relevant_facts_prompt
+from case_analyzer.rules_of_law import build_rules_of_law_prompt
+from case_analyzer.choice_of_law_issue import (
+    build_classification_prompt,
+    build_choice_of_law_issue_prompt,
+    lookup_definition,
+)
+from case_analyzer.courts_position import build_courts_position_prompt
+from case_analyzer.passage_retrieval import PassageIndex
+from llm_handler.batch_api import run_batch
+from config import PASSAGE_RETRIEVAL
+
+
+def _custom_id(case_id, stage):
+    return f"{case_id}|{stage}"
+
+
+def analyze_cases_in_batches(cases, model, concepts, backend):
+    """
+    Batch API counterpart of running CaseAnalyzer.analyze() for every case.
+    `cases` is a list of (case_id, text) tuples. The stages are submitted in
+    waves that follow their dependencies:
+      1. CoL section
+      2. abstract, relevant facts, PIL provisions and theme classification
+      3. choice of law issue (needs the theme)
+      4. court's position (needs the issue)
+    Returns a list of result dicts with the same layout as analyze(), plus "ID".
+    """
+    prompts = {
+        name: load_prompt(filename)
+        for name, filename in [
+            ("col_section", "col_section.txt"),
+            ("abstract", "abstract.txt"),
+            ("relevant_facts", "facts.txt"),
+            ("rules_of_law", "rules.txt"),
+            ("classification", "issue_classification.txt"),
+            ("choice_of_law_issue", "issue.txt"),
+            ("courts_position", "position.txt"),
+        ]
+    }
+    texts = {str(case_id): text for case_id, text in cases}
+
+    # Wave 1: CoL section, searched chunk by chunk in long decisions
+    chunks = {case_id: chunk_decision(text, model) for case_id, text in texts.items()}
+    wave = {}
+    for case_id, text in texts.items():
+        if len(chunks[case_id]) == 1:
+            wave[_custom_id(case_id, "col_section")] = build_col_section_prompt(
+                text, prompts["col_section"]
+            )
+            continue
+        for part, chunk in enumerate(chunks[case_id], start=1):
+            wave[_custom_id(case_id, f"col_section_chunk_{part}")] = build_col_section_chunk_prompt(
+                chunk, prompts["col_section"], part, len(chunks[case_id])
+            )
+    outputs = run_batch(wave, model, backend, "wave1_col_section")
+
+    # Wave 1b: merge the candidate passages of long decisions
+    quotes, wave = {}, {}
+    for case_id in texts:
+        if len(chunks[case_id]) == 1:
+            quotes[case_id] = outputs.get(_custom_id(case_id, "col_section"))
+            continue
+        responses = [
+            outputs.get(_custom_id(case_id, f"col_section_chunk_{part}"))
+            for part in range(1, len(chunks[case_id]) + 1)
+        ]
+        candidates = select_candidates(responses, chunks[case_id])
+        if any(response is None for response in responses):
+            quotes[case_id] = None  # a chunk was not answered; the case is retried on --resume
+        elif len(candidates) <= 1:
+            quotes[case_id] = candidates[0] if candidates else NO_SECTION
+        else:
+            wave[_custom_id(case_id, "col_section")] = build_col_section_merge_prompt(
+                candidates, prompts["col_section"]
+            )
+    if wave:
+        outputs.update(run_batch(wave, model, backend, "wave1b_col_section_merge"))
+        for custom_id in wave:
+            quotes[custom_id.rpartition("|")[0]] = outputs.get(custom_id)
+
+    indexes = {}
+
+    def stage_text(case_id, stage):
+        # Full text, or the passages selected for the stage (see CaseAnalyzer.stage_text)
+        if not PASSAGE_RETRIEVAL:
+            return texts[case_id]
+        if case_id not in indexes:
+            indexes[case_id] = PassageIndex(texts[case_id], model)
+        return indexes[case_id].context(stage, quotes[case_id])
+
+    # Wave 2: stages that only depend on the CoL section
+    wave = {}
+    for case_id in texts:
+        quote = quotes[case_id]
+        if quote is None:
+            continue
+        wave[_custom_id(case_id, "abstract")] = build_abstract_prompt(
+            stage_text(case_id, "abstract"), quote, prompts["abstract"]
+        )
+        wave[_custom_id(case_id, "relevant_facts")] = build_relevant_facts_prompt(
+            stage_text(case_id, "relevant_facts"), quote, prompts["relevant_facts"]
+        )
+        wave[_custom_id(case_id, "rules_of_law")] = build_rules_of_law_prompt(
+            stage_text(case_id, "rules_of_law"), quote, prompts["rules_of_law"]
+        )
+        wave[_custom_id(case_id, "classification")] = build_classification_prompt(
+            stage_text(case_id, "choice_of_law_issue"), quote, prompts["classification"], concepts
+        )
+    outputs.update(run_batch(wave, model, backend, "wave2_independent_stages"))
+
+    # Wave 3: choice of law issue
+    wave = {}
+    for case_id in texts:
+        classification = outputs.get(_custom_id(case_id, "classification"))
+        if classification is None:
+            continue
+        definition = lookup_definition(classification, concepts)
+        wave[_custom_id(case_id, "choice_of_law_issue")] = build_choice_of_law_issue_prompt(
+            stage_text(case_id, "choice_of_law_issue"),
+            quotes[case_id],
+            prompts["choice_of_law_issue"],
+            classification,
+            definition,
+        )
+    outputs.update(run_batch(wave, model, backend, "wave3_choice_of_law_issue"))
+
+    # Wave 4: court's position
+    wave = {}
+    for case_id in texts:
+        issue = outputs.get(_custom_id(case_id, "choice_of_law_issue"))
+        if issue is None:
+            continue
+        wave[_custom_id(case_id, "courts_position")] = build_courts_position_prompt(
+            stage_text(case_id, "courts_position"), quotes[case_id], prompts["courts_position"], issue
+        )
+    outputs.update(run_batch(wave, model, backend, "wave4_courts_position"))
+
+    results = []
+    for original_id, _ in cases:
+        case_id = str(original_id)
+        result = {
+            "ID": original_id,
+            "Quote": quotes[case_id],
+            "Abstract": outputs.get(_custom_id(case_id, "abstract")),
+            "Relevant facts / Summary of the case": outputs.get(_custom_id(case_id, "relevant_facts")),
+            "PIL provisions": outputs.get(_custom_id(case_id, "rules_of_law")),
+            "Themes": outputs.get(_custom_id(case_id, "classification")),
+            "Choice of law issue": outputs.get(_custom_id(case_id, "choice_of_law_issue")),
+            "Court's position": outputs.get(_custom_id(case_id, "courts_position")),
+        }
+        # Failed or missing batch requests leave stages empty; marking the row as an
+        # error makes --resume analyze the case again
+        missing = [column for column, value in result.items() if value is None]
+        if missing:
+            result["Error"] = f"No batch output for: {', '.join(missing)}"
+        results.append(result)
+    return results
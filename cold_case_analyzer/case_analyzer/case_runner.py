@@ -0,0 +1,211 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import CASE_ANALYSIS_WORKERS
+from case_analyzer import CaseAnalyzer, format_duration
+from llm_handler.usage import usage_context
+
+
+def analyze_case(
+    case_id, text, quote, model, concepts, fused_extraction=None, incremental=None
+):
+    """
+    Runs CaseAnalyzer.analyze() for one case. Errors are caught and returned as
+    {"ID": ..., "Error": ...} so that one failing case does not abort the run.
+    """
+    try:
+        with usage_context(case_id=case_id):
+            analysis_results = CaseAnalyzer(
+                text, quote, model, concepts, fused_extraction, incremental=incremental
+            ).analyze()
+        return {"ID": case_id, **analysis_results}
+    except Exception as error:
+        print(f"Case {case_id} failed: {type(error).__name__}: {error}")
+        return {"ID": case_id, "Error": f"{type(error).__name__}: {error}"}
+
+
+async def aanalyze_case(
+    case_id, text, quote, model, concepts, fused_extraction=None, incremental=None
+):
+    """Async counterpart of analyze_case(), using CaseAnalyzer.aanalyze()."""
+    try:
+        with usage_context(case_id=case_id):
+            analysis_results = await CaseAnalyzer(
+                text, quote, model, concepts, fused_extraction, incremental=incremental
+            ).aanalyze()
+        return {"ID": case_id, **analysis_results}
+    except Exception as error:
+        print(f"Case {case_id} failed: {type(error).__name__}: {error}")
+        return {"ID": case_id, "Error": f"{type(error).__name__}: {error}"}
+
+
+def _print_progress(case_id, case_start, start_time, finished, failed, total):
+    elapsed = time.time() - start_time
+    progress = f"{finished}/{total}" if total else f"{finished}"
+    eta = ""
+    if total:
+        remaining = elapsed / finished * (total - finished)
+        eta = f", ETA {format_duration(remaining)}"
+    print(
+        f"[{progress}] Case {case_id} done in {format_duration(time.time() - case_start)} "
+        f"(elapsed {format_duration(elapsed)}{eta}, {failed} failed)"
+    )
+
+
+def iter_case_results(
+    cases,
+    model,
+    concepts,
+    workers=CASE_ANALYSIS_WORKERS,
+    total=None,
+    fused_extraction=None,
+    incremental=None,
+):
+    """
+    Analyzes `cases` ((case_id, text, quote) tuples) with up to `workers` cases in
+    flight and yields (input index, result dict) as each case finishes. `cases` may
+    be any iterable; only `workers` cases are taken from it at a time, and nothing
+    is kept after a result has been yielded. `total` is used for the progress/ETA
+    output and defaults to len(cases) where available. `fused_extraction` and
+    `incremental` are passed on to CaseAnalyzer.
+    """
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1")
+    if total is None and hasattr(cases, "__len__"):
+        total = len(cases)
+    cases = enumerate(cases)
+    finished = 0
+    failed = 0
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def submit_next():
+            for index, (case_id, text, quote) in cases:
+                future = executor.submit(
+                    analyze_case,
+                    case_id,
+                    text,
+                    quote,
+                    model,
+                    concepts,
+                    fused_extraction,
+                    incremental,
+                )
+                pending[future] = (index, case_id, time.time())
+                return
+
+        for _ in range(workers):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, case_id, case_start = pending.pop(future)
+                result = future.result()
+                finished += 1
+                if "Error" in result:
+                    failed += 1
+                submit_next()
+                _print_progress(case_id, case_start, start_time, finished, failed, total)
+                yield index, result
+
+    if failed:
+        print(f"{failed} of {finished} cases failed; see the 'Error' column of the results")
+
+
+async def aiter_case_results(
+    cases,
+    model,
+    concepts,
+    workers=CASE_ANALYSIS_WORKERS,
+    total=None,
+    fused_extraction=None,
+    incremental=None,
+):
+    """
+    Async counterpart of iter_case_results(): up to `workers` cases run as tasks
+    on the current event loop (their LLM calls bounded by LLM_MAX_CONCURRENCY)
+    and (input index, result dict) is yielded as each case finishes.
+    """
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1")
+    if total is None and hasattr(cases, "__len__"):
+        total = len(cases)
+    cases = enumerate(cases)
+    finished = 0
+    failed = 0
+    start_time = time.time()
+    pending = {}
+
+    def submit_next():
+        for index, (case_id, text, quote) in cases:
+            task = asyncio.ensure_future(
+                aanalyze_case(case_id, text, quote, model, concepts, fused_extraction, incremental)
+            )
+            pending[task] = (index, case_id, time.time())
+            return
+
+    for _ in range(workers):
+        submit_next()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, case_id, case_start = pending.pop(task)
+                result = task.result()
+                finished += 1
+                if "Error" in result:
+                    failed += 1
+                submit_next()
+                _print_progress(case_id, case_start, start_time, finished, failed, total)
+                yield index, result
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if failed:
+        print(f"{failed} of {finished} cases failed; see the 'Error' column of the results")
+
+
+def iter_case_results_async(
+    cases,
+    model,
+    concepts,
+    workers=CASE_ANALYSIS_WORKERS,
+    total=None,
+    fused_extraction=None,
+    incremental=None,
+):
+    """
+    Runs aiter_case_results() on its own event loop and yields its results to
+    synchronous callers, as a drop-in replacement for iter_case_results().
+    """
+    loop = asyncio.new_event_loop()
+    results = aiter_case_results(cases, model, concepts, workers, total, fused_extraction, incremental)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
+
+
+def analyze_cases(
+    cases,
+    model,
+    concepts,
+    workers=CASE_ANALYSIS_WORKERS,
+    total=None,
+    fused_extraction=None,
+    incremental=None,
+):
+    """Like iter_case_results(), but returns all result dicts in input order."""
+    results = dict(
+        iter_case_results(cases, model, concepts, workers, total, fused_extraction, incremental)
+    )
+    return [results[index] for index in sorted(results)]
@@ -1,19 +1,41 @@
-import pandas as pd
-from fuzzywuzzy import process
-from llm_handler.model_access import prompt_model
+from llm_handler.model_access import prompt_model, aprompt_model
+from case_analyzer.prompt_layout import assemble_prompt
+from case_analyzer.theme_resolver import get_theme_resolver
+from case_analyzer.concepts_format import concepts_prompt
+from llm_handler.usage import usage_context
+
+
+def build_classification_prompt(text, quote, classification_prompt, concepts):
+    return assemble_prompt(text, [classification_prompt, concepts_prompt(concepts)], quote)
+
+
+def build_choice_of_law_issue_prompt(text, quote, prompt, classification, definition):
+    theme = (
+        f"The issue in this case is related to this theme: {classification}, "
+        f"which can be defined as: {definition}"
+    )
+    return assemble_prompt(text, [prompt, theme], quote)
+
+
+def lookup_definition(classification, concepts):
+    """Returns the definition(s) of the concept keyword(s) that best match the classification."""
+    return get_theme_resolver(concepts).definition(classification)
 
 
 def classify_choice_of_law_issue(text, quote, classification_prompt, model, concepts):
-    prompt_issue_classification = f"""{classification_prompt}
-                    {concepts}
+    prompt_issue_classification = build_classification_prompt(
+        text, quote, classification_prompt, concepts
+    )
+    with usage_context(stage="classification"):
+        return prompt_model(prompt_issue_classification, model)
 
-                    Here is the text of the Court Decision:
-                    {text}
 
-                    Here is the section of the Court Decision containing Choice of Law related information:
-                    {quote}
-                    """
-    return prompt_model(prompt_issue_classification, model)
+async def aclassify_choice_of_law_issue(text, quote, classification_prompt, model, concepts):
+    prompt_issue_classification = build_classification_prompt(
+        text, quote, classification_prompt, concepts
+    )
+    with usage_context(stage="classification"):
+        return await aprompt_model(prompt_issue_classification, model)
 
 
 def extract_choice_of_law_issue(
@@ -23,19 +45,24 @@ def extract_choice_of_law_issue(
         text, quote, classification_prompt, model, concepts
     )
     # print("This court decision has been classified as: ", classification)
-    definition = concepts.loc[
-        concepts["Keywords"]
-        == process.extractOne(classification, concepts["Keywords"])[0],
-        "Definition",
-    ].values[0]
+    return classification, extract_issue_for_classification(
+        text, quote, prompt, model, concepts, classification
+    )
+
+
+def extract_issue_for_classification(text, quote, prompt, model, concepts, classification):
+    """The choice of law issue, given the theme classification."""
+    definition = lookup_definition(classification, concepts)
     # print("The definition of this classification is: ", definition)
-    prompt_issue = f"""{prompt}
-                The issue in this case is related to this theme: {classification}, which can be defined as: {definition}
-    
-                Here is the text of the Court Decision:
-                {text}
-
-                Here is the section of the Court Decision containing Choice of Law related information:
-                {quote}
-                """
-    return classification, prompt_model(prompt_issue, model)
+    prompt_issue = build_choice_of_law_issue_prompt(
+        text, quote, prompt, classification, definition
+    )
+    return prompt_model(prompt_issue, model)
+
+
+async def aextract_issue_for_classification(text, quote, prompt, model, concepts, classification):
+    definition = lookup_definition(classification, concepts)
+    prompt_issue = build_choice_of_law_issue_prompt(
+        text, quote, prompt, classification, definition
+    )
+    return await aprompt_model(prompt_issue, model)
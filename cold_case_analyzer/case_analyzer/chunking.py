@@ -0,0 +1,92 @@
+"""
+Token-aware splitting of long court decisions.
+
+Decisions are first cut into structural units: numbered considerations ("2.3.1",
+"E. 4"), section headings (Sachverhalt, Erwägungen, Considérants, ...), page
+markers and form feeds. Units are then packed greedily into chunks of at most
+`max_tokens` tokens; a unit that is longer than the budget on its own is split
+further on paragraphs, sentences and finally characters.
+"""
+
+import re
+from llm_handler.token_counting import count_tokens
+
+# A new unit starts at a line that opens a numbered consideration or a heading,
+# or at a page marker / form feed.
+_UNIT_START = re.compile(
+    r"""^(?=[ \t]*(?:
+        (?:E\.|Erw\.|consid\.|cons\.)?[ \t]*\d+(?:\.\d+)*\.?[ \t]+\S     # 2.3.1 / E. 4 / 3.
+      | [IVX]+\.[ \t]+\S                                              # II. Roman numbers
+      | (?:Sachverhalt|Erwägungen?|Erwägung|Dispositiv|Demnach\ erkennt
+          |Faits|En\ fait|En\ droit|Considérants?|Considérant|Par\ ces\ motifs
+          |Fatti|Diritto|Considerand[oi]|Per\ questi\ motivi
+          |Facts|Reasons|Considerations|Held)\b
+      | (?:Seite|Page|Pagina)[ \t]+\d+
+      | -[ \t]*\d+[ \t]*-[ \t]*$                                      # - 12 -
+    ))""",
+    re.MULTILINE | re.VERBOSE | re.IGNORECASE,
+)
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def split_units(text):
+    """Cuts a decision into structural units; form feeds always end a unit."""
+    units = []
+    for page in text.split("\f"):
+        starts = sorted({0, *(match.start() for match in _UNIT_START.finditer(page))})
+        units.extend(page[start:end] for start, end in zip(starts, starts[1:] + [len(page)]))
+    return [unit for unit in units if unit.strip()]
+
+
+def _split_oversized(unit, max_tokens, model):
+    """Splits one unit that exceeds the budget: paragraphs, then sentences, then characters."""
+    for pattern in (_PARAGRAPH_BREAK, _SENTENCE_END):
+        parts = [part for part in pattern.split(unit) if part.strip()]
+        if len(parts) > 1:
+            return _pack(parts, max_tokens, model)
+    # A single very long "sentence": cut by characters at roughly the budget
+    size = max(1, len(unit) * max_tokens // max(1, count_tokens(unit, model)))
+    return [unit[start:start + size] for start in range(0, len(unit), size)]
+
+
+def _pack(units, max_tokens, model):
+    chunks = []
+    current, current_tokens = [], 0
+    for unit in units:
+        tokens = count_tokens(unit, model)
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(unit, max_tokens, model))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit.strip("\n"))
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def split_into_chunks(text, max_tokens, model="gpt-4o"):
+    """Splits `text` on structural boundaries into chunks of at most `max_tokens` tokens."""
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+    return _pack(split_units(text), max_tokens, model)
+
+
+def split_passages(text, max_tokens, model="gpt-4o"):
+    """Structural units and paragraphs of `text` (not packed), each of at most `max_tokens` tokens."""
+    passages = []
+    for unit in split_units(text):
+        for paragraph in _PARAGRAPH_BREAK.split(unit):
+            if not paragraph.strip():
+                continue
+            if count_tokens(paragraph, model) > max_tokens:
+                passages.extend(_split_oversized(paragraph, max_tokens, model))
+            else:
+                passages.append(paragraph.strip("\n"))
+    return passages
@@ -1,10 +1,125 @@
-from llm_handler.model_access import prompt_model
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    COL_CHUNK_THRESHOLD_TOKENS,
+    COL_CHUNK_MAX_TOKENS,
+    COL_CHUNK_WORKERS,
+    COL_MAX_CANDIDATES,
+)
+from llm_handler.model_access import prompt_model, aprompt_model
+from llm_handler.token_counting import count_tokens
+from case_analyzer.chunking import split_into_chunks
+from case_analyzer.prompt_layout import assemble_prompt
+
+NO_SECTION = "NONE"
+CHUNK_INSTRUCTIONS = (
+    "The text above is part {part} of {parts} of the court decision. If this part "
+    f'contains no passage related to the choice of law, answer only with "{NO_SECTION}".'
+)
+MERGE_INSTRUCTIONS = (
+    "The text above consists of candidate passages that were extracted from the parts "
+    "of a long court decision, in the order in which they appear in the decision."
+)
+
+# Terms that mark choice-of-law reasoning, used to rank candidate passages
+COL_KEYWORDS = (
+    "choice of law", "applicable law", "governing law", "governed by",
+    "private international law", "conflict of laws", "pila", "art. 116", "art. 117",
+    "rechtswahl", "anwendbar", "ipr", "kollisionsrecht", "internationales privatrecht",
+    "droit applicable", "loi applicable", "élection de droit", "ldip",
+    "diritto applicabile", "scelta del diritto", "dip",
+)
+
+
+def build_col_section_prompt(text, prompt):
+    return assemble_prompt(text, prompt)
+
+
+def build_col_section_chunk_prompt(chunk, prompt, part, parts):
+    return assemble_prompt(chunk, [prompt, CHUNK_INSTRUCTIONS.format(part=part, parts=parts)])
+
+
+def build_col_section_merge_prompt(candidates, prompt):
+    return assemble_prompt("\n\n".join(candidates), [prompt, MERGE_INSTRUCTIONS])
+
+
+def chunk_decision(text, model):
+    """The decision as one piece, or in chunks if it exceeds COL_CHUNK_THRESHOLD_TOKENS."""
+    if count_tokens(str(text), model) <= COL_CHUNK_THRESHOLD_TOKENS:
+        return [text]
+    return split_into_chunks(str(text), COL_CHUNK_MAX_TOKENS, model)
+
+
+def _normalize(text):
+    return " ".join(str(text).split()).lower()
+
+
+def score_candidate(candidate, chunk):
+    """
+    (verbatim, keyword hits): passages that really occur in their chunk rank above
+    paraphrased ones, then by the number of choice-of-law terms they contain.
+    """
+    normalized = _normalize(candidate)
+    keywords = sum(normalized.count(keyword) for keyword in COL_KEYWORDS)
+    return normalized in _normalize(chunk), keywords
+
+
+def select_candidates(responses, chunks):
+    """
+    Drops the chunks without a CoL passage, keeps the COL_MAX_CANDIDATES best
+    passages and returns them in document order.
+    """
+    candidates = [
+        (score_candidate(response, chunk), index, response.strip())
+        for index, (response, chunk) in enumerate(zip(responses, chunks))
+        if response and response.strip().strip('."').upper() != NO_SECTION
+    ]
+    best = sorted(candidates, key=lambda candidate: candidate[0], reverse=True)[:COL_MAX_CANDIDATES]
+    return [response for _, _, response in sorted(best, key=lambda candidate: candidate[1])]
 
 
 def extract_col_section(text, prompt, model):
-    prompt_col_section = f"""{prompt}
-    
-                Here is the text of the Court Decision:
-                {text}
-                """
-    return prompt_model(prompt_col_section, model)
+    """
+    Extracts the CoL section in one call, or for long decisions map-reduce style:
+    every chunk is searched concurrently, and the best candidate passages are merged
+    by a final call on the candidates only.
+    """
+    chunks = chunk_decision(text, model)
+    if len(chunks) == 1:
+        return prompt_model(build_col_section_prompt(text, prompt), model)
+
+    print(f"Long decision: searching the CoL section in {len(chunks)} chunks")
+    prompts = [
+        build_col_section_chunk_prompt(chunk, prompt, part, len(chunks))
+        for part, chunk in enumerate(chunks, start=1)
+    ]
+    with ThreadPoolExecutor(max_workers=COL_CHUNK_WORKERS) as executor:
+        # Each call runs in a copy of the caller's context (usage metrics attribution)
+        futures = [
+            executor.submit(contextvars.copy_context().run, prompt_model, chunk_prompt, model)
+            for chunk_prompt in prompts
+        ]
+        responses = [future.result() for future in futures]
+    candidates = select_candidates(responses, chunks)
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else NO_SECTION
+    return prompt_model(build_col_section_merge_prompt(candidates, prompt), model)
+
+
+async def aextract_col_section(text, prompt, model):
+    chunks = chunk_decision(text, model)
+    if len(chunks) == 1:
+        return await aprompt_model(build_col_section_prompt(text, prompt), model)
+
+    print(f"Long decision: searching the CoL section in {len(chunks)} chunks")
+    responses = await asyncio.gather(
+        *(
+            aprompt_model(build_col_section_chunk_prompt(chunk, prompt, part, len(chunks)), model)
+            for part, chunk in enumerate(chunks, start=1)
+        )
+    )
+    candidates = select_candidates(responses, chunks)
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else NO_SECTION
+    return await aprompt_model(build_col_section_merge_prompt(candidates, prompt), model)
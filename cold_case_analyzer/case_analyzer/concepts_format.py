@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from config import CONCEPTS_FORMAT, CONCEPTS_MAX_TOKENS
+from llm_handler.token_counting import count_tokens
+
+# Marks a definition that was shortened to fit the token budget
+ELLIPSIS = " …"
+
+
+def _clean(value):
+    return " ".join(str(value).split())
+
+
+def _shorten(definition, limit):
+    if limit is None or len(definition) <= limit:
+        return definition
+    return definition[:limit].rsplit(" ", 1)[0] + ELLIPSIS
+
+
+def render_concepts(rows, fmt="markdown", limit=None):
+    """
+    Renders (keyword, definition) rows as a minimal markdown table ("markdown") or
+    as one "keyword: definition" line per concept ("lines"). Definitions longer
+    than `limit` characters are cut at a word boundary.
+    """
+    if fmt == "lines":
+        return "\n".join(f"{keyword}: {_shorten(definition, limit)}" for keyword, definition in rows)
+    if fmt != "markdown":
+        raise ValueError(f"Unknown concepts format '{fmt}', use 'markdown' or 'lines'")
+    lines = ["| Keywords | Definition |", "|---|---|"]
+    for keyword, definition in rows:
+        keyword = keyword.replace("|", "\\|")
+        definition = _shorten(definition, limit).replace("|", "\\|")
+        lines.append(f"| {keyword} | {definition} |")
+    return "\n".join(lines)
+
+
+def serialize_concepts(concepts, fmt=CONCEPTS_FORMAT, max_tokens=CONCEPTS_MAX_TOKENS, model="gpt-4o"):
+    """
+    Returns (text, tokens) for the concepts table. With `max_tokens` > 0 all
+    definitions are shortened to the same, largest length that fits the budget.
+    """
+    rows = [
+        (_clean(keyword), _clean(definition))
+        for keyword, definition in zip(concepts["Keywords"], concepts["Definition"])
+    ]
+    text = render_concepts(rows, fmt)
+    tokens = count_tokens(text, model)
+    if not max_tokens or tokens <= max_tokens:
+        return text, tokens
+
+    # Binary search for the longest definition length that fits
+    low, high = 0, max((len(definition) for _, definition in rows), default=0)
+    best = render_concepts(rows, fmt, 0)
+    while low <= high:
+        limit = (low + high) // 2
+        candidate = render_concepts(rows, fmt, limit)
+        if count_tokens(candidate, model) <= max_tokens:
+            best, low = candidate, limit + 1
+        else:
+            high = limit - 1
+    return best, count_tokens(best, model)
+
+
+def concepts_fingerprint(concepts):
+    """Content hash of the keywords and definitions; changes whenever the source table does."""
+    digest = hashlib.sha256()
+    for keyword, definition in zip(concepts["Keywords"], concepts["Definition"]):
+        digest.update(f"{keyword}\x1f{definition}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+_cache_lock = threading.Lock()
+_last_table = (None, None)
+_rendered = {}
+
+
+def concepts_prompt(concepts):
+    """
+    The serialized concepts table for the classification prompt. Rendered once per
+    table content: the same table object is served without rehashing, and a table
+    that was fetched again from the Excel file or Airtable is only re-rendered if
+    its content changed.
+    """
+    global _last_table
+    if isinstance(concepts, str):
+        return concepts
+    with _cache_lock:
+        if _last_table[0] is concepts:
+            return _last_table[1]
+        key = (concepts_fingerprint(concepts), CONCEPTS_FORMAT, CONCEPTS_MAX_TOKENS)
+        if key not in _rendered:
+            text, tokens = serialize_concepts(concepts)
+            print(f"Concepts table rendered as {CONCEPTS_FORMAT} ({tokens} tokens)")
+            _rendered[key] = text
+        _last_table = (concepts, _rendered[key])
+        return _rendered[key]
@@ -1,14 +1,16 @@
-from llm_handler.model_access import prompt_model
+from llm_handler.model_access import prompt_model, aprompt_model
+from case_analyzer.prompt_layout import assemble_prompt
+
+
+def build_courts_position_prompt(text, quote, prompt, issue):
+    return assemble_prompt(text, [prompt, issue], quote)
 
 
 def extract_courts_position(text, quote, prompt, issue, model):
-    prompt_position = f"""{prompt}
-                {issue}
-    
-                Here is the text of the Court Decision:
-                {text}
-
-                Here is the section of the Court Decision containing Choice of Law related information:
-                {quote}
-                """
-    return prompt_model(prompt_position, model)
+    return prompt_model(build_courts_position_prompt(text, quote, prompt, issue), model)
+
+
+async def aextract_courts_position(text, quote, prompt, issue, model):
+    return await aprompt_model(
+        build_courts_position_prompt(text, quote, prompt, issue), model
+    )
@@ -0,0 +1,90 @@
+import json
+from llm_handler.model_access import prompt_model, aprompt_model
+from case_analyzer.prompt_layout import assemble_prompt
+
+# Fields extracted together in one call, with the prompt file of their single stage
+FUSED_FIELDS = {
+    "abstract": "abstract.txt",
+    "relevant_facts": "facts.txt",
+    "pil_provisions": "rules.txt",
+}
+
+FUSED_SCHEMA = {
+    "name": "case_extraction",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "abstract": {"type": "string"},
+            "relevant_facts": {"type": "string"},
+            "pil_provisions": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": list(FUSED_FIELDS),
+        "additionalProperties": False,
+    },
+}
+
+FUSED_INSTRUCTIONS = (
+    "Complete the three tasks below for the court decision above. Answer with a single "
+    'JSON object with the keys "abstract", "relevant_facts" and "pil_provisions". Each '
+    "value contains only the answer to the task of the same name; "
+    '"pil_provisions" is a list of strings.'
+)
+
+
+def build_fused_prompt(text, quote, prompts):
+    """`prompts` maps each field of FUSED_FIELDS to the prompt of its single stage."""
+    tasks = [f'Task "{field}":\n{prompts[field].strip()}' for field in FUSED_FIELDS]
+    return assemble_prompt(text, [FUSED_INSTRUCTIONS, *tasks], quote)
+
+
+def _load_json(response):
+    if not response:
+        return None
+    response = response.strip()
+    # Backends without JSON mode tend to wrap the object in a code fence
+    if response.startswith("```"):
+        response = response.strip("`")
+        if response.startswith("json"):
+            response = response[len("json"):]
+    try:
+        data = json.loads(response)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _valid_text(value):
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _valid_provisions(value):
+    # Same format as the single-stage answer: a JSON list of provision strings
+    if isinstance(value, list) and value and all(_valid_text(item) for item in value):
+        return json.dumps([item.strip() for item in value], ensure_ascii=False)
+    return None
+
+
+VALIDATORS = {
+    "abstract": _valid_text,
+    "relevant_facts": _valid_text,
+    "pil_provisions": _valid_provisions,
+}
+
+
+def parse_fused_response(response):
+    """Returns {field: value}, with None for every field that is missing or invalid."""
+    data = _load_json(response) or {}
+    return {field: VALIDATORS[field](data.get(field)) for field in FUSED_FIELDS}
+
+
+def extract_fused_fields(text, quote, prompts, model):
+    response = prompt_model(build_fused_prompt(text, quote, prompts), model, json_schema=FUSED_SCHEMA)
+    return parse_fused_response(response)
+
+
+async def aextract_fused_fields(text, quote, prompts, model):
+    response = await aprompt_model(
+        build_fused_prompt(text, quote, prompts), model, json_schema=FUSED_SCHEMA
+    )
+    return parse_fused_response(response)
@@ -0,0 +1,172 @@
+"""
+Local pre-retrieval of the passages a stage needs.
+
+After the CoL section is known, the later stages do not need the whole decision.
+PassageIndex splits a decision into passages (see chunking.split_passages) and
+scores them with BM25 against private international law vocabulary, stage-specific
+terms and the extracted CoL section. Each stage then gets the best passages that
+fit its token budget (PASSAGE_CONTEXT_TOKENS), in document order.
+
+Note that stages with different contexts no longer share the decision text as a
+common prompt prefix, so provider-side prompt caching saves less on such runs.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from config import PASSAGE_MAX_TOKENS, PASSAGE_CONTEXT_TOKENS
+from llm_handler.token_counting import count_tokens
+from case_analyzer.chunking import split_passages
+
+# Marks passages that were left out between two selected ones
+OMISSION = "\n[...]\n"
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+PIL_VOCABULARY = (
+    "private international law", "choice of law", "applicable law", "governing law",
+    "governed by", "conflict of laws", "Rome I", "Rome II", "Hague Convention",
+    "Lugano Convention", "CISG", "PILA", "LDIP", "IPRG", "Art. 116", "Art. 117",
+    "Rechtswahl", "anwendbares Recht", "anwendbar", "Kollisionsrecht",
+    "internationales Privatrecht", "droit applicable", "loi applicable",
+    "élection de droit", "droit international privé", "diritto applicabile",
+    "scelta del diritto", "diritto internazionale privato",
+)
+
+# Additional query terms per stage
+STAGE_TERMS = {
+    "abstract": (
+        "Sachverhalt", "Dispositiv", "Demnach erkennt", "Faits", "Par ces motifs",
+        "Fatti", "Per questi motivi", "facts", "held", "appeal", "Beschwerde", "recours",
+    ),
+    "relevant_facts": (
+        "Sachverhalt", "Faits", "Fatti", "facts", "Vertrag", "contrat", "contratto",
+        "contract", "Klägerin", "Beklagte", "demanderesse", "défenderesse", "plaintiff",
+        "defendant", "Parteien", "parties",
+    ),
+    "rules_of_law": (
+        "Art.", "Artikel", "article", "articolo", "Abs.", "al.", "cpv.", "para.",
+        "Convention", "Übereinkommen", "Verordnung", "règlement", "regulation",
+    ),
+    "choice_of_law_issue": ("Frage", "question", "questione", "issue", "strittig", "litigieux"),
+    "courts_position": (
+        "Erwägungen", "Considérants", "Considerandi", "reasons", "held", "therefore",
+        "folglich", "demnach", "partant", "pertanto", "Dispositiv", "Par ces motifs",
+    ),
+}
+STAGE_TERMS["fused_extraction"] = tuple(
+    term for stage in ("abstract", "relevant_facts", "rules_of_law") for term in STAGE_TERMS[stage]
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def terms(text):
+    """Lower-cased words and word bigrams, so that phrases like 'Rome I' or 'Art. 116' match."""
+    words = _WORD.findall(str(text).lower())
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class RetrievalStats:
+    """Thread-safe totals of full-text vs. selected-context tokens per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage, full_tokens, context_tokens):
+        with self._lock:
+            totals = self._stages.setdefault(stage, {"calls": 0, "full_tokens": 0, "context_tokens": 0})
+            totals["calls"] += 1
+            totals["full_tokens"] += full_tokens
+            totals["context_tokens"] += context_tokens
+
+    def stats(self):
+        with self._lock:
+            stages = {stage: dict(totals) for stage, totals in self._stages.items()}
+        full = sum(totals["full_tokens"] for totals in stages.values())
+        context = sum(totals["context_tokens"] for totals in stages.values())
+        return {
+            "full_tokens": full,
+            "context_tokens": context,
+            "saved_ratio": 1 - context / full if full else 0.0,
+            "stages": stages,
+        }
+
+
+retrieval_stats_tracker = RetrievalStats()
+
+
+def retrieval_stats():
+    return retrieval_stats_tracker.stats()
+
+
+class PassageIndex:
+    """BM25 index over the passages of one decision."""
+
+    def __init__(self, text, model, passage_tokens=PASSAGE_MAX_TOKENS):
+        self.text = str(text)
+        self.model = model
+        self.total_tokens = count_tokens(self.text, model)
+        self.passages = split_passages(self.text, passage_tokens, model)
+        self.tokens = [count_tokens(passage, model) for passage in self.passages]
+        self.term_counts = [Counter(terms(passage)) for passage in self.passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        size = len(self.passages)
+        self.idf = {
+            term: math.log(1 + (size - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query):
+        """BM25 score of every passage for `query` (a Counter of terms)."""
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = K1 * (1 - B + B * length / self.average_length) if self.average_length else K1
+            score = 0.0
+            for term, weight in query.items():
+                frequency = counts.get(term)
+                if frequency:
+                    score += weight * self.idf[term] * frequency * (K1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+    def select(self, query, max_tokens):
+        """The best-scoring passages that fit into `max_tokens`, in document order."""
+        scores = self.scores(query)
+        # Passages without any match fill the remaining budget from the beginning
+        ranked = sorted(range(len(self.passages)), key=lambda index: (-scores[index], index))
+        chosen, used = [], 0
+        for index in ranked:
+            if used + self.tokens[index] <= max_tokens:
+                chosen.append(index)
+                used += self.tokens[index]
+        parts = []
+        previous = None
+        for index in sorted(chosen):
+            if parts and index != previous + 1:
+                parts.append(OMISSION)
+            parts.append(self.passages[index] + "\n")
+            previous = index
+        return "".join(parts).strip("\n")
+
+    def context(self, stage, quote=None):
+        """
+        Text to send for `stage`: the full decision if it fits the stage's budget
+        (or the stage has none), otherwise the selected passages.
+        """
+        budget = PASSAGE_CONTEXT_TOKENS.get(stage)
+        if not budget or self.total_tokens <= budget:
+            retrieval_stats_tracker.record(stage, self.total_tokens, self.total_tokens)
+            return self.text
+        query = Counter(terms(" ".join(PIL_VOCABULARY + STAGE_TERMS.get(stage, ()))))
+        if quote:
+            query.update(terms(quote))
+        context = self.select(query, budget)
+        retrieval_stats_tracker.record(stage, self.total_tokens, count_tokens(context, self.model))
+        return context
@@ -0,0 +1,34 @@
+"""
+Prompt assembly shared by all stages.
+
+Every stage sends the same (long) court decision, so the decision text is placed
+in a leading block that is byte-identical for all seven calls of a case, followed
+by the CoL section, and only then by the stage-specific instructions. Provider-side
+prompt caching matches on the longest common prefix, so stages 2-7 can reuse the
+cached decision text instead of paying for it again.
+"""
+
+DECISION_HEADER = "Here is the text of the Court Decision:"
+COL_SECTION_HEADER = (
+    "Here is the section of the Court Decision containing Choice of Law related information:"
+)
+
+
+def _clean(part):
+    return str(part).strip()
+
+
+def assemble_prompt(text, instructions, quote=None):
+    """
+    Builds '<decision text>[<CoL section>]<instructions>'.
+    `instructions` is either a string or a list of parts (e.g. the stage prompt and
+    the concepts table); parts are stripped and separated by blank lines.
+    """
+    if isinstance(instructions, str):
+        instructions = [instructions]
+    blocks = [f"{DECISION_HEADER}\n{_clean(text)}"]
+    if quote is not None:
+        blocks.append(f"{COL_SECTION_HEADER}\n{_clean(quote)}")
+    blocks.append("\n\n".join(_clean(part) for part in instructions if part is not None))
+    return "\n\n".join(blocks) + "\n"
+
@@ -1,13 +1,14 @@
-from llm_handler.model_access import prompt_model
+from llm_handler.model_access import prompt_model, aprompt_model
+from case_analyzer.prompt_layout import assemble_prompt
+
+
+def build_rules_of_law_prompt(text, quote, prompt):
+    return assemble_prompt(text, prompt, quote)
 
 
 def extract_rules_of_law(text, quote, prompt, model):
-    prompt_rules = f"""{prompt}
-    
-                Here is the text of the Court Decision:
-                {text}
-
-                Here is the section of the Court Decision containing Choice of Law related information:
-                {quote}
-                """
-    return prompt_model(prompt_rules, model)
+    return prompt_model(build_rules_of_law_prompt(text, quote, prompt), model)
+
+
+async def aextract_rules_of_law(text, quote, prompt, model):
+    return await aprompt_model(build_rules_of_law_prompt(text, quote, prompt), model)
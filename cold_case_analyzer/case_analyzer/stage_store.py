@@ -0,0 +1,141 @@
+"""
+Stage outputs keyed by a fingerprint of their inputs, for incremental re-analysis.
+
+A stage's fingerprint covers the decision text, its prompt file(s), the model,
+stage-specific settings and the fingerprints of the stages it depends on. When
+only prompts/position.txt changes, only the court's position gets a new
+fingerprint; a changed col_section.txt changes the CoL section's fingerprint and
+thereby the fingerprints of every later stage. Unchanged stages are served from
+the store, independent of the LLM response cache and its mode or eviction.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import STAGE_STORE_PATH
+
+# Bump when the way a stage turns its inputs into an output changes
+STAGE_STORE_VERSION = 1
+
+
+def fingerprint(*parts):
+    """sha256 over the JSON form of `parts`."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def stage_fingerprint(stage, text_hash, prompts, model, upstream, settings):
+    """
+    Fingerprint of one stage run. `prompts` are the prompt texts, `upstream` the
+    fingerprints of the stages it depends on (by name) and `settings` any
+    configuration that changes its output.
+    """
+    return fingerprint(
+        STAGE_STORE_VERSION,
+        stage,
+        text_hash,
+        [fingerprint(prompt) for prompt in prompts],
+        model,
+        upstream,
+        settings,
+    )
+
+
+class StageStore:
+    """SQLite table of stage outputs (stored as JSON) keyed by stage fingerprint."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counts = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stage_outputs (
+                    fingerprint TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connection(self):
+        # One connection per thread, as in llm_handler/response_cache.py
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stage, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(stage, {"reused": 0, "computed": 0})
+            counts[outcome] += 1
+
+    def _lookup(self, stage_fingerprint):
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT output FROM stage_outputs WHERE fingerprint = ?", (stage_fingerprint,)
+            ).fetchone()
+
+    def _store(self, stage, stage_fingerprint, output):
+        self._count(stage, "computed")
+        if output is None or (isinstance(output, dict) and None in output.values()):
+            # Failed or empty answers (also partial fused extractions) are retried next time,
+            # as in ResponseCache.set()
+            return
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_outputs (fingerprint, stage, output, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (stage_fingerprint, stage, json.dumps(output, ensure_ascii=False), time.time()),
+            )
+
+    def run(self, stage, stage_fingerprint, compute):
+        """The stored output for `stage_fingerprint`, or compute() (stored unless it is None)."""
+        row = self._lookup(stage_fingerprint)
+        if row is not None:
+            self._count(stage, "reused")
+            return json.loads(row[0])
+        output = compute()
+        self._store(stage, stage_fingerprint, output)
+        return output
+
+    async def arun(self, stage, stage_fingerprint, compute):
+        """Async counterpart of run(); `compute` is a coroutine function."""
+        row = self._lookup(stage_fingerprint)
+        if row is not None:
+            self._count(stage, "reused")
+            return json.loads(row[0])
+        output = await compute()
+        self._store(stage, stage_fingerprint, output)
+        return output
+
+    def stats(self):
+        """Reused and recomputed outputs per stage in this run."""
+        with self._lock:
+            return {stage: dict(counts) for stage, counts in self._counts.items()}
+
+
+_store_lock = threading.Lock()
+_store = None
+
+
+def get_stage_store():
+    """The process-wide StageStore (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StageStore(STAGE_STORE_PATH)
+        return _store
+
+
+def stage_store_stats():
+    return _store.stats() if _store is not None else {}
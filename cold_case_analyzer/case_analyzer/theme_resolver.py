@@ -0,0 +1,88 @@
+import json
+import threading
+from rapidfuzz import fuzz, process, utils
+from config import THEME_MATCH_CUTOFF
+
+
+def normalize_theme(theme):
+    """Lower-cased, punctuation-free, single-spaced form used for matching."""
+    return " ".join(utils.default_process(str(theme)).split())
+
+
+def split_themes(classification):
+    """
+    Theme strings of a classification answer, which may be a JSON list
+    ('["Theme 1", "Theme 2"]'), a quoted string or a comma-separated list.
+    """
+    classification = str(classification).strip()
+    try:
+        parsed = json.loads(classification)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, str):
+        parsed = [parsed]
+    if isinstance(parsed, list):
+        return [str(theme).strip() for theme in parsed if str(theme).strip()]
+    parts = classification.strip("[]").replace(";", ",").replace("\n", ",").split(",")
+    return [part.strip().strip("\"'").strip() for part in parts if part.strip().strip("\"'").strip()]
+
+
+class ThemeResolver:
+    """
+    Maps classification answers to the keywords of the concepts table. Built once
+    per concepts table: exact (normalized) matches are dict lookups, everything
+    else is matched with RapidFuzz against the precomputed normalized keywords.
+    """
+
+    def __init__(self, concepts, score_cutoff=THEME_MATCH_CUTOFF):
+        self.score_cutoff = score_cutoff
+        self.definitions = dict(zip(concepts["Keywords"], concepts["Definition"]))
+        self.keywords = list(self.definitions)
+        self._normalized = [normalize_theme(keyword) for keyword in self.keywords]
+        self._exact = dict(zip(self._normalized, self.keywords))
+
+    def _match(self, theme, score_cutoff):
+        normalized = normalize_theme(theme)
+        if normalized in self._exact:
+            return self._exact[normalized]
+        match = process.extractOne(
+            normalized,
+            self._normalized,
+            scorer=fuzz.WRatio,
+            processor=None,
+            score_cutoff=score_cutoff,
+        )
+        return self.keywords[match[2]] if match else None
+
+    def resolve(self, classification):
+        """Keywords for every theme in `classification`, in answer order and without duplicates."""
+        # Fast path: the whole answer is one keyword (also keeps keywords containing commas intact)
+        whole = self._exact.get(normalize_theme(classification))
+        if whole:
+            return [whole]
+        keywords = [self._match(theme, self.score_cutoff) for theme in split_themes(classification)]
+        keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+        if not keywords and self.keywords:
+            # Nothing passed the cutoff: fall back to the closest keyword overall
+            keywords = [self._match(classification, 0)]
+        return keywords
+
+    def definition(self, classification):
+        """The definition of the matched theme; one 'keyword: definition' line per theme if several."""
+        keywords = self.resolve(classification)
+        if len(keywords) == 1:
+            return self.definitions[keywords[0]]
+        return "\n".join(f"{keyword}: {self.definitions[keyword]}" for keyword in keywords)
+
+
+_resolver_lock = threading.Lock()
+_resolver = (None, None)
+
+
+def get_theme_resolver(concepts):
+    """The ThemeResolver of `concepts`; rebuilt only when a different table is passed."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver[0] is not concepts:
+            _resolver = (concepts, ThemeResolver(concepts))
+        return _resolver[1]
@@ -3,18 +3,19 @@ from typing import TypedDict, List, Optional, Dict, Any
 from langchain_openai import ChatOpenAI # Added for llm_instance typing
 
 # Import node functions
-from nodes.input_node import text_input_node
-from nodes.col_extractor import col_extraction_node
-from nodes.theme_classifier import theme_classification_node
-from nodes.analysis_runner import (
+from cca_langgraph.nodes.input_node import text_input_node
+from cca_langgraph.nodes.col_extractor import col_extraction_node
+from cca_langgraph.nodes.theme_classifier import theme_classification_node
+from cca_langgraph.nodes.analysis_runner import (
     run_abstract_tool,
     run_relevant_facts_tool,
     run_pil_provisions_tool,
     run_col_issue_tool,
     run_courts_position_tool
 )
-from nodes.formatter import present_analysis_result_node
-from nodes.interrupt_handler import (
+from cca_langgraph.nodes.formatter import present_analysis_result_node
+from llm_handler.tracing import traced
+from cca_langgraph.nodes.interrupt_handler import (
     interrupt_for_col_validation,
     interrupt_for_theme_validation,
     interrupt_for_full_analysis_review
@@ -42,23 +43,32 @@ class CourtAnalysisSchema(TypedDict):
     # refine_section: Optional[str]
 
 
+def _traced_node(name, node):
+    # Every node run becomes an OpenTelemetry span (if tracing is enabled)
+    return traced(f"langgraph {name}", node, **{"langgraph.node": name})
+
+
 def create_graph(llm_instance: ChatOpenAI):
     workflow = StateGraph(CourtAnalysisSchema)
 
     # Add nodes
     # Wrapping tool/logic nodes to pass llm_instance
-    workflow.add_node("text_input_node", text_input_node)
-    workflow.add_node("col_section_node", lambda state: col_extraction_node(state, llm_instance))
-    workflow.add_node("ask_user_col_confirmation_node", interrupt_for_col_validation)
-    workflow.add_node("pil_theme_node", lambda state: theme_classification_node(state, llm_instance))
-    workflow.add_node("ask_user_theme_confirmation_node", interrupt_for_theme_validation)
-    workflow.add_node("abstract_node", lambda state: run_abstract_tool(state, llm_instance))
-    workflow.add_node("relevant_facts_node", lambda state: run_relevant_facts_tool(state, llm_instance))
-    workflow.add_node("pil_provisions_node", lambda state: run_pil_provisions_tool(state, llm_instance))
-    workflow.add_node("col_issue_node", lambda state: run_col_issue_tool(state, llm_instance))
-    workflow.add_node("courts_position_node", lambda state: run_courts_position_tool(state, llm_instance))
-    workflow.add_node("present_result_node", present_analysis_result_node)
-    workflow.add_node("final_review_node", interrupt_for_full_analysis_review)
+    nodes = {
+        "text_input_node": text_input_node,
+        "col_section_node": lambda state: col_extraction_node(state, llm_instance),
+        "ask_user_col_confirmation_node": interrupt_for_col_validation,
+        "pil_theme_node": lambda state: theme_classification_node(state, llm_instance),
+        "ask_user_theme_confirmation_node": interrupt_for_theme_validation,
+        "abstract_node": lambda state: run_abstract_tool(state, llm_instance),
+        "relevant_facts_node": lambda state: run_relevant_facts_tool(state, llm_instance),
+        "pil_provisions_node": lambda state: run_pil_provisions_tool(state, llm_instance),
+        "col_issue_node": lambda state: run_col_issue_tool(state, llm_instance),
+        "courts_position_node": lambda state: run_courts_position_tool(state, llm_instance),
+        "present_result_node": present_analysis_result_node,
+        "final_review_node": interrupt_for_full_analysis_review,
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, _traced_node(name, node))
 
 
     # Define edges
@@ -1,16 +1,21 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import MemorySaver
 
-from graph_config import create_graph, CourtAnalysisSchema
+# Run from cold_case_analyzer/ as `python -m cca_langgraph.main`, so that the shared
+# packages (llm_handler, config) are importable next to cca_langgraph
+from cca_langgraph.graph_config import create_graph, CourtAnalysisSchema
+from llm_handler.backends import get_backend
+from llm_handler.single_flight import single_flight_stats
 
 # Load environment variables (e.g., OPENAI_API_KEY)
 load_dotenv()
 
 # Initialize the LLM
 # Ensure your OPENAI_API_KEY is set in your .env file or environment
-llm = ChatOpenAI(model="gpt-4.1-nano", temperature=0)
+# The model comes from the backend registry (llm_handler/backends.py) and reuses
+# the shared pooled HTTP client across all graph nodes and tools
+llm = get_backend(os.getenv("CCA_LANGGRAPH_MODEL", "gpt-4.1-nano")).chat_model(temperature=0)
 
 # Predefined themes table (as a string for the prompt, and as a dict for logic)
 # This should ideally be loaded from a config file or database in a real application
@@ -100,6 +105,7 @@ def run_analyzer():
         print(final_result["formatted_analysis"])
     else:
         print("Formatted analysis not found in the final result.")
+    print(f"In-flight deduplication: {single_flight_stats()}")
 
 if __name__ == "__main__":
     run_analyzer()
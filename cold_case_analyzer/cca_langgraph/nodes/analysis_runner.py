@@ -1,8 +1,8 @@
-from tools.abstract_tool import abstract_tool
-from tools.facts_tool import relevant_facts_tool
-from tools.provisions_tool import pil_provisions_tool
-from tools.col_issue_tool import col_issue_tool
-from tools.courts_position_tool import courts_position_tool
+from cca_langgraph.tools.abstract_tool import abstract_tool
+from cca_langgraph.tools.facts_tool import relevant_facts_tool
+from cca_langgraph.tools.provisions_tool import pil_provisions_tool
+from cca_langgraph.tools.col_issue_tool import col_issue_tool
+from cca_langgraph.tools.courts_position_tool import courts_position_tool
 
 # These functions will be wrapped into nodes in the graph_config
 
@@ -1,4 +1,4 @@
-from tools.col_section import col_section_tool
+from cca_langgraph.tools.col_section import col_section_tool
 
 def col_extraction_node(state, llm_instance):
     """Node to call the col_section_tool."""
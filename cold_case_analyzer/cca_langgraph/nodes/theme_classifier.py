@@ -1,4 +1,4 @@
-from tools.pil_theme import pil_theme_tool
+from cca_langgraph.tools.pil_theme import pil_theme_tool
 
 def theme_classification_node(state, llm_instance):
     """Node to call the pil_theme_tool."""
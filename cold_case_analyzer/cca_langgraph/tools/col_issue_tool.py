@@ -1,6 +1,7 @@
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from prompts.prompt_templates import COL_ISSUE_PROMPT
+from cca_langgraph.prompts.prompt_templates import COL_ISSUE_PROMPT
+from llm_handler.single_flight import invoke_llm
 
 @tool
 def col_issue_tool(text: str, quote: str, classification: list[str], themes_table: dict, llm: ChatOpenAI) -> dict:
@@ -12,5 +13,5 @@ def col_issue_tool(text: str, quote: str, classification: list[str], themes_tabl
     definition = themes_table.get(main_theme, "No definition available for the provided theme.")
     
     prompt = COL_ISSUE_PROMPT.format(text=text, quote=quote, classification=classification, definition=definition)
-    response = llm.invoke(prompt)
+    response = invoke_llm(llm, prompt)
     return {"col_issue": response.content}
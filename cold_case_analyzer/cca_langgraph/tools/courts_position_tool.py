@@ -1,10 +1,11 @@
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from prompts.prompt_templates import COURTS_POSITION_PROMPT
+from cca_langgraph.prompts.prompt_templates import COURTS_POSITION_PROMPT
+from llm_handler.single_flight import invoke_llm
 
 @tool
 def courts_position_tool(text: str, quote: str, col_issue: str, llm: ChatOpenAI) -> dict:
     """Summarizes the court's general position on the identified CoL issue."""
     prompt = COURTS_POSITION_PROMPT.format(text=text, quote=quote, col_issue=col_issue)
-    response = llm.invoke(prompt)
+    response = invoke_llm(llm, prompt)
     return {"courts_position": response.content}
@@ -1,13 +1,14 @@
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from prompts.prompt_templates import PIL_THEME_PROMPT
+from cca_langgraph.prompts.prompt_templates import PIL_THEME_PROMPT
 import json
+from llm_handler.single_flight import invoke_llm
 
 @tool
 def pil_theme_tool(text: str, quote: str, themes_table: str, llm: ChatOpenAI) -> dict:
     """Classifies the case based on its CoL issue into predefined themes."""
     prompt = PIL_THEME_PROMPT.format(text=text, quote=quote, themes_table=themes_table)
-    response = llm.invoke(prompt)
+    response = invoke_llm(llm, prompt)
     # Assuming the LLM returns a string representation of a list, e.g., "['Theme 1', 'Theme 2']"
     try:
         classification = json.loads(response.content)
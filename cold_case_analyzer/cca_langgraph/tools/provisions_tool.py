@@ -1,13 +1,14 @@
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from prompts.prompt_templates import PIL_PROVISIONS_PROMPT
+from cca_langgraph.prompts.prompt_templates import PIL_PROVISIONS_PROMPT
 import json
+from llm_handler.single_flight import invoke_llm
 
 @tool
 def pil_provisions_tool(text: str, quote: str, llm: ChatOpenAI) -> dict:
     """Extracts relevant PIL provisions, sorted by relevance."""
     prompt = PIL_PROVISIONS_PROMPT.format(text=text, quote=quote)
-    response = llm.invoke(prompt)
+    response = invoke_llm(llm, prompt)
     try:
         provisions = json.loads(response.content)
     except json.JSONDecodeError:
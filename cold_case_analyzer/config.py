@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,3 +10,165 @@ AIRTABLE_CD_TABLE = os.getenv("AIRTABLE_CD_TABLE")
 AIRTABLE_CONCEPTS_TABLE = os.getenv("AIRTABLE_CONCEPTS_TABLE")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 LLAMA_API_KEY = os.getenv("LLAMA_API_KEY")
+
+# Local mirror of the Airtable tables (see data_handler/airtable_mirror.py)
+AIRTABLE_ENDPOINT_URL = os.getenv("AIRTABLE_ENDPOINT_URL", "https://api.airtable.com")
+AIRTABLE_MIRROR_PATH = os.getenv(
+    "AIRTABLE_MIRROR_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "cache", "airtable_mirror.sqlite"),
+)
+# Serve the tables from the mirror without contacting Airtable
+AIRTABLE_OFFLINE = os.getenv("AIRTABLE_OFFLINE", "false").lower() in ("1", "true", "yes")
+# Deleted records are only noticed by a full sync, which runs at least this often
+AIRTABLE_FULL_SYNC_DAYS = float(os.getenv("AIRTABLE_FULL_SYNC_DAYS", "7"))
+# Record id ranges listed in parallel, within Airtable's limit of 5 requests per second
+AIRTABLE_SYNC_PARTITIONS = int(os.getenv("AIRTABLE_SYNC_PARTITIONS", "4"))
+AIRTABLE_REQUESTS_PER_SECOND = float(os.getenv("AIRTABLE_REQUESTS_PER_SECOND", "5"))
+# Fields fetched from the case and concepts tables ([] fetches all fields)
+AIRTABLE_CD_FIELDS = json.loads(
+    os.getenv(
+        "AIRTABLE_CD_FIELDS",
+        '["ID", "Case Citation", "Original Text", "Quote", "Jurisdictions", "Abstract", '
+        '"Relevant Facts", "PIL Provisions", "Themes", "Choice of Law Issue", "Court\'s Position"]',
+    )
+)
+AIRTABLE_CONCEPTS_FIELDS = json.loads(
+    os.getenv(
+        "AIRTABLE_CONCEPTS_FIELDS", '["Keywords", "Definition", "Relevant for case analysis"]'
+    )
+)
+
+# Parquet copies of the Excel inputs, reused while the workbook is unchanged
+EXCEL_PARQUET_CACHE = os.getenv("EXCEL_PARQUET_CACHE", "true").lower() in ("1", "true", "yes")
+EXCEL_PARQUET_DIR = os.getenv(
+    "EXCEL_PARQUET_DIR", os.path.join(os.path.dirname(__file__), "data", "cache", "parquet")
+)
+
+# LLM response cache (see llm_handler/response_cache.py)
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "cache", "llm_responses.sqlite"),
+)
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "use")  # use | refresh | bypass
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+
+# Shared OpenAI connection pool (see llm_handler/clients.py)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+# Retries are handled by llm_handler/rate_limiter.py, so the client itself does not retry
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+
+# Maximum number of in-flight requests for the async API (aprompt_model)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "50"))
+
+# Model backends (see llm_handler/backends.py)
+# LLM_BACKENDS registers additional OpenAI-compatible endpoints (vLLM, llama.cpp server, ...), e.g.
+# {"vllm-llama3": {"base_url": "http://localhost:8000/v1", "model": "meta-llama/Llama-3.1-8B-Instruct"}}
+LLM_BACKENDS = json.loads(os.getenv("LLM_BACKENDS", "{}"))
+# Per-backend limits for in-flight requests, e.g. {"gpt-4o": 20, "vllm-llama3": 8}
+LLM_BACKEND_CONCURRENCY = json.loads(os.getenv("LLM_BACKEND_CONCURRENCY", "{}"))
+
+# Number of cases analyzed concurrently (see case_analyzer/case_runner.py)
+CASE_ANALYSIS_WORKERS = int(os.getenv("CASE_ANALYSIS_WORKERS", "8"))
+# Run the cases as tasks on one event loop (aprompt_model) instead of worker threads;
+# CASE_ANALYSIS_WORKERS then bounds the cases in flight
+ASYNC_ANALYSIS = os.getenv("ASYNC_ANALYSIS", "false").lower() in ("1", "true", "yes")
+
+# Stream the own-data cases from disk instead of loading them all at once
+# (see data_handler/case_source.py); .xlsx, .parquet or .jsonl
+STREAM_CASES = os.getenv("STREAM_CASES", "false").lower() in ("1", "true", "yes")
+CASE_SOURCE_PATH = os.getenv(
+    "CASE_SOURCE_PATH", os.path.join(os.path.dirname(__file__), "data", "raw", "cases_test.xlsx")
+)
+# Cases read ahead of the workers while streaming
+CASE_READ_AHEAD = int(os.getenv("CASE_READ_AHEAD", "32"))
+
+# Extract abstract, relevant facts and PIL provisions in one structured call
+# (see case_analyzer/fused_extraction.py)
+FUSED_EXTRACTION = os.getenv("FUSED_EXTRACTION", "false").lower() in ("1", "true", "yes")
+
+# Decisions longer than COL_CHUNK_THRESHOLD_TOKENS are searched for the CoL section
+# chunk by chunk (see case_analyzer/col_section.py and case_analyzer/chunking.py)
+COL_CHUNK_THRESHOLD_TOKENS = int(os.getenv("COL_CHUNK_THRESHOLD_TOKENS", "24000"))
+COL_CHUNK_MAX_TOKENS = int(os.getenv("COL_CHUNK_MAX_TOKENS", "8000"))
+COL_CHUNK_WORKERS = int(os.getenv("COL_CHUNK_WORKERS", "8"))
+# Number of candidate passages kept for the final merge call
+COL_MAX_CANDIDATES = int(os.getenv("COL_MAX_CANDIDATES", "4"))
+
+# Minimum RapidFuzz score (0-100) for matching a classified theme to a concept keyword
+THEME_MATCH_CUTOFF = float(os.getenv("THEME_MATCH_CUTOFF", "80"))
+
+# Concepts table in the classification prompt: "markdown" table or "lines"
+# ("keyword: definition"); CONCEPTS_MAX_TOKENS > 0 shortens definitions to fit
+CONCEPTS_FORMAT = os.getenv("CONCEPTS_FORMAT", "markdown")
+CONCEPTS_MAX_TOKENS = int(os.getenv("CONCEPTS_MAX_TOKENS", "0"))
+
+# Send the later stages a bounded selection of the decision's most relevant passages
+# instead of the full text (see case_analyzer/passage_retrieval.py)
+PASSAGE_RETRIEVAL = os.getenv("PASSAGE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "300"))
+# Context budget per stage in tokens; stages without a budget get the full text
+PASSAGE_CONTEXT_TOKENS = json.loads(
+    os.getenv(
+        "PASSAGE_CONTEXT_TOKENS",
+        '{"abstract": 4000, "relevant_facts": 4000, "rules_of_law": 3000, '
+        '"choice_of_law_issue": 3000, "courts_position": 3000, "fused_extraction": 5000}',
+    )
+)
+
+# Incremental re-analysis: reuse stage outputs whose inputs (decision, prompt, model,
+# settings, upstream stages) did not change (see case_analyzer/stage_store.py)
+INCREMENTAL_ANALYSIS = os.getenv("INCREMENTAL_ANALYSIS", "false").lower() in ("1", "true", "yes")
+STAGE_STORE_PATH = os.getenv(
+    "STAGE_STORE_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "cache", "stage_outputs.sqlite"),
+)
+
+# Record/replay of LLM traffic (see llm_handler/cassette.py): off | record | replay
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")
+LLM_CASSETTE_PATH = os.getenv(
+    "LLM_CASSETTE_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "cassettes", "llm_cassette.jsonl.gz"),
+)
+if LLM_CASSETTE_MODE == "record" and LLM_CACHE_MODE == "use":
+    # Cached answers never reach the network and would be missing from the cassette
+    LLM_CACHE_MODE = "refresh"
+elif LLM_CASSETTE_MODE == "replay":
+    # Replays are served from the cassette only (llm_handler/clients.py supplies
+    # a placeholder API key if none is set)
+    LLM_CACHE_MODE = "bypass"
+
+# Rate-limit-aware request scheduling (see llm_handler/rate_limiter.py)
+# LLM_RATE_LIMITS overrides the per-model defaults, keyed by the model names of --model
+# (not the provider model ids), e.g. {"gpt-4o-mini": {"rpm": 5000, "tpm": 800000}}
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+LLM_RATE_LIMIT_HEADROOM = float(os.getenv("LLM_RATE_LIMIT_HEADROOM", "0.9"))
+LLM_RATE_LIMIT_BURST_SECONDS = float(os.getenv("LLM_RATE_LIMIT_BURST_SECONDS", "10"))
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "500"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# Offline Batch API mode (see llm_handler/batch_api.py)
+LLM_BATCH_DIR = os.getenv(
+    "LLM_BATCH_DIR", os.path.join(os.path.dirname(__file__), "data", "batches")
+)
+LLM_BATCH_POLL_INTERVAL = float(os.getenv("LLM_BATCH_POLL_INTERVAL", "60"))
+LLM_BATCH_MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", "50000"))
+LLM_BATCH_MAX_BYTES = int(os.getenv("LLM_BATCH_MAX_BYTES", str(190 * 1024 * 1024)))
+
+# OpenTelemetry tracing (see llm_handler/tracing.py)
+# Comma-separated exporters: console, file, otlp (empty: tracing off). The OTLP
+# exporter reads the standard OTEL_EXPORTER_OTLP_* variables.
+TRACING_EXPORTERS = [
+    exporter.strip().lower()
+    for exporter in os.getenv("TRACING_EXPORTERS", "").split(",")
+    if exporter.strip()
+]
+TRACING_FILE = os.getenv(
+    "TRACING_FILE", os.path.join(os.path.dirname(__file__), "data", "traces.jsonl")
+)
@@ -0,0 +1,278 @@
+"""
+Local SQLite mirror of the Airtable tables.
+
+Instead of listing every record of a table on each run, the mirror only asks
+Airtable for the records modified since the last sync (a LAST_MODIFIED_TIME()
+formula with a small overlap for clock skew) and upserts them. Deleted records
+cannot be seen that way, so a full sync replaces the mirrored table whenever it
+was never synced, the requested fields changed, or the last full sync is older
+than AIRTABLE_FULL_SYNC_DAYS. Listings are split into record id ranges that are
+paged in parallel, sharing one limiter that keeps all of them within Airtable's
+5 requests per second per base. With AIRTABLE_OFFLINE=true (or --airtable-offline)
+the tables are served from the mirror without contacting Airtable.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pyairtable import Api
+from requests import HTTPError
+from config import (
+    AIRTABLE_API_KEY,
+    AIRTABLE_BASE_ID,
+    AIRTABLE_ENDPOINT_URL,
+    AIRTABLE_MIRROR_PATH,
+    AIRTABLE_OFFLINE,
+    AIRTABLE_FULL_SYNC_DAYS,
+    AIRTABLE_SYNC_PARTITIONS,
+    AIRTABLE_REQUESTS_PER_SECOND,
+)
+
+# Records modified this long before the previous sync started are fetched again
+SYNC_OVERLAP = timedelta(minutes=5)
+
+# Characters that follow the "rec" prefix of Airtable record ids
+RECORD_ID_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+_UNKNOWN_FIELD = re.compile(r'Unknown field name: \\?"(.+?)\\?"')
+
+
+# Fraction of the per-second limit used, as in llm_handler/rate_limiter.py
+RATE_HEADROOM = 0.9
+
+
+class RequestSpacer:
+    """Spaces requests evenly below `per_second`, across all threads."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / (per_second * RATE_HEADROOM) if per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def partition_formulas(partitions):
+    """REGEX_MATCH formulas that split all record ids into `partitions` ranges."""
+    partitions = max(1, min(partitions, len(RECORD_ID_ALPHABET)))
+    if partitions == 1:
+        return [None]
+    size = -(-len(RECORD_ID_ALPHABET) // partitions)
+    chunks = [RECORD_ID_ALPHABET[i:i + size] for i in range(0, len(RECORD_ID_ALPHABET), size)]
+    return [f"REGEX_MATCH(RECORD_ID(), '^rec[{chunk}]')" for chunk in chunks]
+
+
+def modified_since_formula(since):
+    timestamp = since.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    return f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{timestamp}'))"
+
+
+def _combine(*formulas):
+    formulas = [formula for formula in formulas if formula]
+    if not formulas:
+        return None
+    return formulas[0] if len(formulas) == 1 else f"AND({', '.join(formulas)})"
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class AirtableMirror:
+    """SQLite copy of the records (id, created time, fields) of the mirrored tables."""
+
+    def __init__(self, path, api=None, partitions=AIRTABLE_SYNC_PARTITIONS,
+                 requests_per_second=AIRTABLE_REQUESTS_PER_SECOND):
+        self.path = path
+        self._api = api
+        self.partitions = partitions
+        self.spacer = RequestSpacer(requests_per_second)
+        self._lock = threading.Lock()
+        self.requests = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS records (
+                    table_id TEXT NOT NULL,
+                    record_id TEXT NOT NULL,
+                    created_time TEXT,
+                    fields TEXT NOT NULL,
+                    PRIMARY KEY (table_id, record_id)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    table_id TEXT PRIMARY KEY,
+                    fields_key TEXT NOT NULL,
+                    synced_at TEXT NOT NULL,
+                    full_synced_at TEXT NOT NULL
+                )
+                """
+            )
+
+    def _connection(self):
+        # Only the calling thread writes; partition threads just fetch pages
+        return sqlite3.connect(self.path, timeout=30)
+
+    @property
+    def api(self):
+        if self._api is None:
+            self._api = Api(AIRTABLE_API_KEY, endpoint_url=AIRTABLE_ENDPOINT_URL)
+        return self._api
+
+    def _sync_state(self, table_id):
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT fields_key, synced_at, full_synced_at FROM sync_state WHERE table_id = ?",
+                (table_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "fields_key": row[0],
+            "synced_at": datetime.fromisoformat(row[1]),
+            "full_synced_at": datetime.fromisoformat(row[2]),
+        }
+
+    def _list_partition(self, table, fields, formula):
+        options = {"page_size": 100}
+        if fields:
+            options["fields"] = fields
+        if formula:
+            options["formula"] = formula
+        records = []
+        while True:
+            self.spacer.acquire()
+            with self._lock:
+                self.requests += 1
+            # One page per request, as in Table.iterate(), but the last page is
+            # recognised by its missing offset instead of by a further call
+            page = table.api.request(
+                method="get",
+                url=table.urls.records,
+                fallback=("post", table.urls.records_post),
+                options=options,
+            )
+            records.extend(page.get("records", []))
+            if not page.get("offset"):
+                return records
+            options = {**options, "offset": page["offset"]}
+
+    def _list(self, table_id, fields, formula):
+        """All records matching `formula`; unknown fields are dropped from `fields`."""
+        table = self.api.table(AIRTABLE_BASE_ID, table_id)
+        fields = list(fields)
+        while True:
+            formulas = [_combine(part, formula) for part in partition_formulas(self.partitions)]
+            try:
+                with ThreadPoolExecutor(max_workers=len(formulas)) as executor:
+                    pages = executor.map(lambda part: self._list_partition(table, fields, part), formulas)
+                    return [record for records in pages for record in records]
+            except HTTPError as error:
+                match = _UNKNOWN_FIELD.search(getattr(error.response, "text", "") or "")
+                if error.response is None or error.response.status_code != 422 or not match:
+                    raise
+                if match.group(1) not in fields:
+                    raise
+                print(f"Airtable table {table_id} has no field '{match.group(1)}', skipping it")
+                fields.remove(match.group(1))
+
+    def sync(self, table_id, fields=(), full=False):
+        """Brings the mirror of `table_id` up to date; returns the number of fetched records."""
+        fields_key = json.dumps(sorted(fields), ensure_ascii=False)
+        state = self._sync_state(table_id)
+        started = _utcnow()
+        if state is not None and state["fields_key"] != fields_key:
+            full = True
+        if state is None or state["full_synced_at"] < started - timedelta(days=AIRTABLE_FULL_SYNC_DAYS):
+            full = True
+
+        since = None if full else state["synced_at"] - SYNC_OVERLAP
+        records = self._list(table_id, fields, modified_since_formula(since) if since else None)
+        rows = [
+            (table_id, record["id"], record.get("createdTime"), json.dumps(record.get("fields", {}), ensure_ascii=False))
+            for record in records
+        ]
+        with self._connection() as conn:
+            if full:
+                conn.execute("DELETE FROM records WHERE table_id = ?", (table_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO records (table_id, record_id, created_time, fields) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (table_id, fields_key, synced_at, full_synced_at) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    table_id,
+                    fields_key,
+                    started.isoformat(),
+                    (started if full else state["full_synced_at"]).isoformat(),
+                ),
+            )
+        kind = "Full" if full else "Incremental"
+        print(f"{kind} sync of Airtable table {table_id}: {len(rows)} records fetched")
+        return len(rows)
+
+    def records(self, table_id):
+        """Mirrored records of `table_id` in Airtable's record format, oldest first."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT record_id, created_time, fields FROM records WHERE table_id = ? "
+                "ORDER BY created_time, record_id",
+                (table_id,),
+            ).fetchall()
+        return [
+            {"id": record_id, "createdTime": created_time, "fields": json.loads(fields)}
+            for record_id, created_time, fields in rows
+        ]
+
+    def is_synced(self, table_id):
+        return self._sync_state(table_id) is not None
+
+
+_mirror_lock = threading.Lock()
+_mirror = None
+
+
+def get_airtable_mirror():
+    """The process-wide AirtableMirror (created on first use)."""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = AirtableMirror(AIRTABLE_MIRROR_PATH)
+        return _mirror
+
+
+def mirrored_records(table_id, fields=(), offline=None, full=False):
+    """
+    Records of `table_id` (restricted to `fields`, all fields if empty), synced
+    incrementally from Airtable unless offline.
+    """
+    mirror = get_airtable_mirror()
+    offline = AIRTABLE_OFFLINE if offline is None else offline
+    if offline:
+        if not mirror.is_synced(table_id):
+            raise RuntimeError(
+                f"Airtable table {table_id} was never synced to {mirror.path}; run once online first"
+            )
+        print(f"Serving Airtable table {table_id} from the local mirror (offline)")
+    else:
+        mirror.sync(table_id, fields, full=full)
+    return mirror.records(table_id)
@@ -1,35 +1,16 @@
 import pandas as pd
-from pyairtable import Api
-from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID
-
-
-# data processing
-def remove_fields_prefix(df):
-    df.columns = df.columns.str.replace("fields.", "")
-    return df
-
-
-def process_list_like_values(df):
-    for col in df.columns:
-        if df[col].apply(lambda x: isinstance(x, list)).any():
-            df[col] = df[col].apply(
-                lambda x: ",".join(map(str, x)) if isinstance(x, list) else x
-            )
-    return df
+from config import AIRTABLE_CD_TABLE, AIRTABLE_CD_FIELDS
+from data_handler.airtable_mirror import mirrored_records
+from data_handler.normalization import records_to_frame
 
 
 # data fetching
-def fetch_data(table_id):
-    api = Api(AIRTABLE_API_KEY)
-    table = api.table(AIRTABLE_BASE_ID, table_id)
-    records = table.all()
+def fetch_data(table_id, offline=None):
+    # Only the case table's analysis and ground truth fields are mirrored
+    fields = AIRTABLE_CD_FIELDS if table_id == AIRTABLE_CD_TABLE else ()
+    records = mirrored_records(table_id, fields, offline=offline)
 
     if records:
-        df = pd.json_normalize(
-            [record["fields"] for record in records]
-        )  # Directly normalize 'fields'
-        df = remove_fields_prefix(df)
-        df = process_list_like_values(df)
-        return df
+        return records_to_frame(records, fields)
     else:
         return pd.DataFrame()  # Return an empty DataFrame if no records
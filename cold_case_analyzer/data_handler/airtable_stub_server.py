@@ -0,0 +1,305 @@
+"""
+Airtable stand-in server for testing the local mirror offline.
+
+Implements the list records endpoints used by pyairtable (GET /v0/{base}/{table}
+and POST /v0/{base}/{table}/listRecords) with pageSize/offset paging, fields
+selection and the filterByFormula forms generated by data_handler/airtable_mirror.py
+(REGEX_MATCH on RECORD_ID(), IS_AFTER on LAST_MODIFIED_TIME() and AND() of both).
+Like Airtable it allows 5 requests per second per base and answers 429 beyond
+that, and 422 for unknown fields. Records are synthetic cases or loaded from a
+JSON file mapping table names to lists of field dicts.
+
+Run from cold_case_analyzer/:
+    python -m data_handler.airtable_stub_server --port 8091 --cases 500
+
+and point the pipeline at it with
+    AIRTABLE_ENDPOINT_URL=http://localhost:8091 AIRTABLE_API_KEY=stub AIRTABLE_BASE_ID=appStub
+GET /stats returns the request and rate limit counters.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import string
+import threading
+import time
+from datetime import datetime, timezone
+from aiohttp import web
+
+RECORD_ID_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+_REGEX_MATCH = re.compile(r"^REGEX_MATCH\(RECORD_ID\(\), '(.+)'\)$")
+_IS_AFTER = re.compile(r"^IS_AFTER\(LAST_MODIFIED_TIME\(\), DATETIME_PARSE\('(.+)'\)\)$")
+
+# Seconds start_in_background() waits for the server to listen
+STARTUP_TIMEOUT = 10
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _timestamp(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _split_arguments(text):
+    # Top-level comma split, ignoring commas inside parentheses and quotes
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    parts.append(current.strip())
+    return parts
+
+
+def compile_formula(formula):
+    """Predicate over stored records for the supported formulas; ValueError otherwise."""
+    formula = (formula or "").strip()
+    if not formula:
+        return lambda record: True
+    if formula.startswith("AND(") and formula.endswith(")"):
+        predicates = [compile_formula(part) for part in _split_arguments(formula[4:-1])]
+        return lambda record: all(predicate(record) for predicate in predicates)
+    match = _REGEX_MATCH.match(formula)
+    if match:
+        pattern = re.compile(match.group(1))
+        return lambda record: pattern.search(record["id"]) is not None
+    match = _IS_AFTER.match(formula)
+    if match:
+        since = _parse_timestamp(match.group(1))
+        return lambda record: record["modified"] > since
+    raise ValueError(f"Unsupported formula: {formula}")
+
+
+def synthetic_cases(count, rng):
+    jurisdictions = ["Switzerland", "Germany", "India", "Brazil", "Japan"]
+    themes = ["Party autonomy", "Tacit choice", "Absence of choice", "Mandatory rules"]
+    return [
+        {
+            "ID": f"CHE-{index:04d}",
+            "Case Citation": f"Case {index}",
+            "Original Text": f"Decision {index}. The parties agreed that Swiss law applies. " * 20,
+            "Quote": f"Swiss law applies ({index})",
+            "Jurisdictions": [rng.choice(jurisdictions)],
+            "Abstract": f"Abstract of case {index}.",
+            "Relevant Facts": f"Facts of case {index}.",
+            "PIL Provisions": ["Art. 116 PILA"],
+            "Themes": [rng.choice(themes)],
+            "Choice of Law Issue": "Can the parties choose the applicable law?",
+            "Court's Position": "Yes, under Art. 116 PILA.",
+        }
+        for index in range(count)
+    ]
+
+
+def synthetic_concepts(count):
+    return [
+        {
+            "Keywords": f"Theme {index}",
+            "Definition": f"Definition of theme {index}.",
+            "Relevant for case analysis": index % 4 != 0,
+        }
+        for index in range(count)
+    ]
+
+
+class AirtableStub:
+    def __init__(self, options):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        self.tables = {}
+        self._lock = threading.Lock()
+        self._recent = {}
+        self.stats = {"requests": 0, "rate_limited": 0, "records_served": 0}
+        if options.records:
+            with open(options.records, "r", encoding="utf-8") as file:
+                for table, rows in json.load(file).items():
+                    for fields in rows:
+                        self.add(table, fields)
+        else:
+            for fields in synthetic_cases(options.cases, self.rng):
+                self.add(options.cases_table, fields)
+            for fields in synthetic_concepts(options.concepts):
+                self.add(options.concepts_table, fields)
+
+    def _record_id(self):
+        return "rec" + "".join(self.rng.choice(RECORD_ID_ALPHABET) for _ in range(14))
+
+    def add(self, table, fields):
+        """Adds a record (thread-safe); returns its id."""
+        with self._lock:
+            moment = _now()
+            record = {"id": self._record_id(), "created": moment, "modified": moment, "fields": dict(fields)}
+            self.tables.setdefault(table, {})[record["id"]] = record
+            return record["id"]
+
+    def update(self, table, record_id, fields):
+        with self._lock:
+            record = self.tables[table][record_id]
+            record["fields"].update(fields)
+            record["modified"] = _now()
+
+    def delete(self, table, record_id):
+        with self._lock:
+            del self.tables[table][record_id]
+
+    def record_ids(self, table):
+        with self._lock:
+            return list(self.tables.get(table, {}))
+
+    def _admit(self, base):
+        # Sliding one-second window per base
+        now = time.monotonic()
+        with self._lock:
+            recent = [moment for moment in self._recent.get(base, []) if now - moment < 1.0]
+            admitted = len(recent) < self.options.requests_per_second
+            if admitted:
+                recent.append(now)
+            self._recent[base] = recent
+            return admitted
+
+    @staticmethod
+    def _error(status, error_type, message):
+        return web.json_response({"error": {"type": error_type, "message": message}}, status=status)
+
+    def _list(self, base, table, params):
+        with self._lock:
+            self.stats["requests"] += 1
+        if not self._admit(base):
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            return self._error(429, "RATE_LIMIT_REACHED", "Rate limit exceeded, retry in 30 seconds")
+        if table not in self.tables:
+            return self._error(404, "TABLE_NOT_FOUND", f"Could not find table {table}")
+        try:
+            predicate = compile_formula(params.get("filterByFormula"))
+        except ValueError as error:
+            return self._error(422, "INVALID_FILTER_BY_FORMULA", str(error))
+        fields = params.get("fields") or []
+        with self._lock:
+            records = sorted(self.tables[table].values(), key=lambda record: (record["created"], record["id"]))
+            known = {name for record in records for name in record["fields"]}
+            unknown = [name for name in fields if name not in known]
+            if unknown:
+                return self._error(422, "UNKNOWN_FIELD_NAME", f'Unknown field name: "{unknown[0]}"')
+            selected = [record for record in records if predicate(record)]
+            page_size = min(int(params.get("pageSize") or 100), 100)
+            start = int(params.get("offset") or 0)
+            page = selected[start:start + page_size]
+            body = {
+                "records": [
+                    {
+                        "id": record["id"],
+                        "createdTime": _timestamp(record["created"]),
+                        "fields": {
+                            name: value for name, value in record["fields"].items()
+                            if not fields or name in fields
+                        },
+                    }
+                    for record in page
+                ]
+            }
+            self.stats["records_served"] += len(page)
+        if start + page_size < len(selected):
+            body["offset"] = str(start + page_size)
+        return web.json_response(body)
+
+    async def list_records(self, request):
+        query = request.query
+        params = {
+            "filterByFormula": query.get("filterByFormula"),
+            "fields": query.getall("fields[]", []),
+            "pageSize": query.get("pageSize"),
+            "offset": query.get("offset"),
+        }
+        return self._list(request.match_info["base"], request.match_info["table"], params)
+
+    async def list_records_post(self, request):
+        params = await request.json()
+        return self._list(request.match_info["base"], request.match_info["table"], params)
+
+    async def get_stats(self, request):
+        with self._lock:
+            return web.json_response(dict(self.stats))
+
+
+def create_app(options, stub=None):
+    stub = stub or AirtableStub(options)
+    app = web.Application()
+    app["stub"] = stub
+    app.router.add_get("/v0/{base}/{table}", stub.list_records)
+    app.router.add_post("/v0/{base}/{table}/listRecords", stub.list_records_post)
+    app.router.add_get("/stats", stub.get_stats)
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Airtable stand-in server for mirror tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--cases", type=int, default=300, help="Number of synthetic case records.")
+    parser.add_argument("--concepts", type=int, default=40, help="Number of synthetic concepts.")
+    parser.add_argument("--cases-table", default="Cases")
+    parser.add_argument("--concepts-table", default="Concepts")
+    parser.add_argument("--records", help="JSON file mapping table names to lists of field dicts.")
+    parser.add_argument("--requests-per-second", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def start_in_background(timeout=STARTUP_TIMEOUT, **overrides):
+    """
+    Starts the stand-in server in a daemon thread and returns (endpoint URL,
+    AirtableStub), so tests can add, update and delete records between syncs.
+    Errors while starting are raised here, and a TimeoutError if the server does
+    not listen within `timeout` seconds.
+    """
+    options = build_parser().parse_args([])
+    for name, value in overrides.items():
+        setattr(options, name, value)
+    stub = AirtableStub(options)
+    started = threading.Event()
+    errors = []
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            runner = web.AppRunner(create_app(options, stub))
+            loop.run_until_complete(runner.setup())
+            loop.run_until_complete(web.TCPSite(runner, options.host, options.port).start())
+        except BaseException as error:
+            errors.append(error)
+            loop.close()
+            return
+        finally:
+            started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    if not started.wait(timeout):
+        raise TimeoutError(f"Airtable stand-in server did not start within {timeout}s")
+    if errors:
+        raise errors[0]
+    return f"http://{options.host}:{options.port}", stub
+
+if __name__ == "__main__":
+    options = build_parser().parse_args()
+    print(f"Airtable stand-in server listening on http://{options.host}:{options.port}")
+    web.run_app(create_app(options), host=options.host, port=options.port, print=None)
@@ -0,0 +1,167 @@
+"""
+Streaming case sources for corpora that should not be loaded into memory at once.
+
+stream_cases(path) yields (ID, text, quote) tuples one case at a time from an
+Excel workbook (openpyxl read-only mode), a Parquet file (record batches) or a
+JSON lines file (one object per case), with the columns named as in
+cases_test.xlsx. A background thread reads up to CASE_READ_AHEAD cases ahead of
+the consumer, so parsing overlaps with the analysis while memory stays bounded
+by the read-ahead and the cases in flight.
+"""
+
+import json
+import os
+import queue
+import threading
+from config import CASE_READ_AHEAD
+
+ID_COLUMN = "ID"
+TEXT_COLUMN = "Original text"
+QUOTE_COLUMN = "Quote"
+
+# Rows per Parquet record batch
+PARQUET_BATCH_SIZE = 64
+
+_DONE = object()
+
+
+def _format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return "excel"
+    if extension == ".parquet":
+        return "parquet"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported case source '{path}', use .xlsx, .parquet or .jsonl")
+
+
+def _excel_rows(path, columns):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else None for name in next(rows, ())]
+        positions = [header.index(name) if name in header else None for name in columns]
+        if positions[0] is None:
+            raise KeyError(f"Column '{columns[0]}' not found in {path}")
+        for row in rows:
+            values = [row[position] if position is not None and position < len(row) else None
+                      for position in positions]
+            if all(value is None for value in values):
+                continue  # trailing empty rows
+            yield values
+    finally:
+        workbook.close()
+
+
+def _parquet_rows(path, columns):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    present = [name for name in columns if name in parquet_file.schema_arrow.names]
+    if columns[0] not in present:
+        raise KeyError(f"Column '{columns[0]}' not found in {path}")
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE, columns=present):
+        for row in batch.to_pylist():
+            yield [row.get(name) for name in columns]
+
+
+def _jsonl_rows(path, columns):
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                row = json.loads(line)
+                yield [row.get(name) for name in columns]
+
+
+_READERS = {"excel": _excel_rows, "parquet": _parquet_rows, "jsonl": _jsonl_rows}
+
+
+def iter_cases(path):
+    """(ID, text, quote) tuples of the cases in `path`, read lazily in file order."""
+    for case_id, text, quote in _READERS[_format(path)](path, [ID_COLUMN, TEXT_COLUMN, QUOTE_COLUMN]):
+        yield case_id, text, quote
+
+
+def iter_case_ids(path):
+    """The case IDs in `path`, without the decision texts."""
+    for (case_id,) in _READERS[_format(path)](path, [ID_COLUMN]):
+        yield case_id
+
+
+def count_cases(path):
+    """Number of cases in `path` for the progress output (None if the workbook does not say)."""
+    source_format = _format(path)
+    if source_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    if source_format == "jsonl":
+        with open(path, "rb") as file:
+            return sum(1 for line in file if line.strip())
+    from openpyxl import load_workbook
+
+    # The dimension stored in the workbook; may include trailing empty rows
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.max_row
+    finally:
+        workbook.close()
+    return rows - 1 if rows else None
+
+
+def read_ahead(iterable, size=CASE_READ_AHEAD):
+    """
+    Yields the items of `iterable`, which a background thread reads up to `size`
+    items ahead. Errors of the reader are raised in the consumer.
+    """
+    if size < 1:
+        yield from iterable
+        return
+    items = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def put(entry):
+        # Gives up once the consumer has stopped, instead of blocking on a full queue
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as error:
+            put((_DONE, error))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # Stops the reader thread if the consumer stopped early
+        stopped.set()
+
+
+def stream_cases(path, skip_ids=(), read_ahead_size=CASE_READ_AHEAD):
+    """
+    (ID, text, quote) tuples of the cases in `path` with bounded read-ahead,
+    leaving out the IDs (as strings) in `skip_ids`, e.g. cases that already have
+    complete results.
+    """
+    skip_ids = set(skip_ids)
+    cases = (case for case in iter_cases(path) if str(case[0]) not in skip_ids)
+    return read_ahead(cases, read_ahead_size)
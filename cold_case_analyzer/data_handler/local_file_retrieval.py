@@ -1,8 +1,89 @@
+import hashlib
+import json
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import EXCEL_PARQUET_CACHE, EXCEL_PARQUET_DIR
 
+# Parquet metadata key holding the size, mtime and hash of the source workbook
+SOURCE_METADATA_KEY = b"cold_case_analyzer.source"
 
-def fetch_local_data():
+# Columns the analysis reads from the case and concept workbooks
+CASE_COLUMNS = ["ID", "Original text", "Quote"]
+CONCEPT_COLUMNS = ["Keywords", "Definition"]
+
+
+def _file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parquet_path(file_path):
+    """Location of the Parquet copy of `file_path` in EXCEL_PARQUET_DIR."""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    location = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(EXCEL_PARQUET_DIR, f"{name}-{location}.parquet")
+
+
+def _cached_source(path):
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    source = metadata.get(SOURCE_METADATA_KEY)
+    return json.loads(source) if source else None
+
+
+def _write_parquet(df, path, source):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_METADATA_KEY] = json.dumps(source).encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written under a temporary name, so a concurrent reader never sees a partial file
+    partial = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), partial)
+    os.replace(partial, path)
+
+
+def read_excel_cached(file_path, columns=None):
+    """
+    pd.read_excel(file_path) with a Parquet copy: the workbook is parsed once and
+    then read from Parquet while its size and mtime, or else its content hash,
+    are unchanged. `columns` loads only those columns (e.g. without the decision
+    texts).
+    """
+    if not EXCEL_PARQUET_CACHE:
+        return pd.read_excel(file_path, usecols=columns)
+    stat = os.stat(file_path)
+    source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    path = parquet_path(file_path)
+    cached = _cached_source(path)
+    if cached is not None:
+        unchanged = cached["size"] == source["size"] and cached["mtime_ns"] == source["mtime_ns"]
+        if not unchanged and cached["size"] == source["size"]:
+            # Touched but not edited (e.g. by a checkout): compare the content
+            source["sha256"] = _file_hash(file_path)
+            unchanged = cached.get("sha256") == source["sha256"]
+            if unchanged:
+                _write_parquet(pd.read_parquet(path), path, source)
+        if unchanged:
+            return pd.read_parquet(path, columns=columns)
+
+    df = pd.read_excel(file_path)
+    source.setdefault("sha256", _file_hash(file_path))
+    try:
+        _write_parquet(df, path, source)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        # Columns mixing e.g. numbers and text cannot be stored as Parquet
+        print(f"Not caching {file_path} as Parquet: {e}")
+    return df[columns] if columns is not None else df
+
+
+def fetch_local_data(columns=None):
     """
     Loads analysis cases from the Excel file located at:
     cold-case-analysis/cold_case_analyzer/data/cases.xlsx
@@ -15,7 +96,7 @@ def fetch_local_data():
         raise FileNotFoundError(f"File not found: {file_path}")
 
     try:
-        df = pd.read_excel(file_path)
+        df = read_excel_cached(file_path, columns)
     except Exception as e:
         print(f"Error reading Excel file at {file_path}: {e}")
         raise
@@ -23,7 +104,7 @@ def fetch_local_data():
     return df
 
 
-def fetch_local_concepts():
+def fetch_local_concepts(columns=None):
     """
     Loads analysis concepts from the Excel file located at:
     cold-case-analysis/cold_case_analyzer/data/raw/concepts.xlsx
@@ -35,14 +116,14 @@ def fetch_local_concepts():
         raise FileNotFoundError(f"File not found: {file_path}")
 
     try:
-        df = pd.read_excel(file_path)
+        df = read_excel_cached(file_path, columns)
     except Exception as e:
         print(f"Error reading Excel file at {file_path}: {e}")
         raise
 
     return df
 
-def fetch_local_ground_truths():
+def fetch_local_ground_truths(columns=None):
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data/raw"))
     file_path = os.path.join(base_dir, "ground_truths.xlsx")
 
@@ -50,7 +131,7 @@ def fetch_local_ground_truths():
         raise FileNotFoundError(f"File not found: {file_path}")
     
     try:
-        df = pd.read_excel(file_path)
+        df = read_excel_cached(file_path, columns)
     except Exception as e:
         print(f"Error reading Excel file at {file_path}: {e}")
         raise
@@ -0,0 +1,51 @@
+"""
+Airtable records to DataFrame conversion, shared by the case and concepts tables.
+
+Builds the columns in one pass over the records instead of pd.json_normalize()
+followed by an apply() over every cell: list values (linked records, multiple
+selects, ...) are joined with "," and nested objects are flattened into
+"field.key" columns, as before, while each value is visited exactly once.
+"""
+
+import pandas as pd
+
+
+def flatten_value(value):
+    """Cell value of a list-like field: its items joined with ","."""
+    if isinstance(value, list):
+        return ",".join(map(str, value))
+    return value
+
+
+def _flatten_fields(fields, prefix=""):
+    for name, value in fields.items():
+        if isinstance(value, dict):
+            yield from _flatten_fields(value, f"{prefix}{name}.")
+        else:
+            yield f"{prefix}{name}", flatten_value(value)
+
+
+def records_to_frame(records, columns=()):
+    """
+    DataFrame of the records' fields. `columns` (the known schema, e.g.
+    AIRTABLE_CD_FIELDS) fixes the order of the leading columns; fields outside
+    the schema follow in order of appearance, and schema fields that no record
+    has are left out. Missing values are None.
+    """
+    data = {name: [] for name in columns}
+    seen = set()
+    rows = 0
+    for rows, record in enumerate(records, start=1):
+        for name, value in _flatten_fields(record.get("fields", {})):
+            column = data.setdefault(name, [])
+            seen.add(name)
+            # Pad the rows this field was missing from
+            if len(column) < rows - 1:
+                column.extend([None] * (rows - 1 - len(column)))
+            column.append(value)
+    frame = {}
+    for name, values in data.items():
+        if name in seen:
+            values.extend([None] * (rows - len(values)))
+            frame[name] = values
+    return pd.DataFrame(frame)
@@ -0,0 +1,100 @@
+import csv
+import glob
+import json
+import os
+import threading
+
+# Columns of a result row, in the order of CaseAnalyzer.analyze()
+RESULT_COLUMNS = [
+    "ID",
+    "Quote",
+    "Abstract",
+    "Relevant facts / Summary of the case",
+    "PIL provisions",
+    "Themes",
+    "Choice of law issue",
+    "Court's position",
+]
+
+
+class ResultSink:
+    """
+    Append-only JSONL file with one result row per line. Every row is flushed and
+    fsynced as soon as it is written, so a crash loses at most the cases that were
+    still in flight. A torn last line (crash mid-write) is ignored when reading.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Terminate a torn last line so the next row starts on a line of its own
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                torn = file.read(1) != b"\n"
+            if torn:
+                with open(path, "a", encoding="utf-8") as file:
+                    file.write("\n")
+
+    def append(self, result):
+        line = json.dumps(result, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _rows(self):
+        """Yields (byte offset, row) for every readable line."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            offset = 0
+            for line in file:
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    pass
+                offset += len(line)
+
+    def completed_ids(self):
+        """IDs (as strings) whose latest row finished without an error."""
+        latest = {}
+        for _, row in self._rows():
+            latest[str(row.get("ID"))] = "Error" not in row
+        return {case_id for case_id, complete in latest.items() if complete}
+
+    def finalize(self, csv_path, ids=None):
+        """
+        Writes the latest row of every ID to `csv_path`, ordered like `ids`
+        (default: first appearance in the file). Rows are read back one at a
+        time via their offsets, so memory use does not grow with the corpus.
+        """
+        offsets = {}
+        failed = {}
+        for offset, row in self._rows():
+            offsets[str(row.get("ID"))] = offset
+            failed[str(row.get("ID"))] = "Error" in row
+        order = [str(case_id) for case_id in ids] if ids is not None else list(offsets)
+        # Errors of earlier attempts that a resumed run has since fixed do not count
+        has_errors = any(failed.get(case_id, False) for case_id in order)
+        columns = RESULT_COLUMNS + (["Error"] if has_errors else [])
+
+        with open(self.path, "rb") as source, open(
+            csv_path, "w", encoding="utf-8", newline=""
+        ) as target:
+            writer = csv.DictWriter(target, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for case_id in order:
+                if case_id not in offsets:
+                    continue
+                source.seek(offsets[case_id])
+                writer.writerow(json.loads(source.readline()))
+        return csv_path
+
+
+def latest_sink_path(folder, model_name):
+    """Most recent case_analysis_results_<timestamp>_<model>.jsonl in `folder`, or None."""
+    paths = glob.glob(os.path.join(folder, f"case_analysis_results_*_{glob.escape(model_name)}.jsonl"))
+    return max(paths) if paths else None
@@ -10,16 +10,22 @@ from evaluator.bertopic import evaluate_bertopic
 from evaluator.g_eval import evaluate_g_eval
 
 # Define a function to load ground truths from the Airtable workflow
-def fetch_airtable_ground_truths():
+def fetch_airtable_ground_truths(columns=None):
     """
     Loads the ground truth data generated by main_airtable() from the file:
     cold_case_analyzer/data/raw/ground_truths.csv
+    `columns` loads only those of the columns that the file has.
     """
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw'))
     file_path = os.path.join(base_dir, 'ground_truths.csv')
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Ground truths file not found: {file_path}")
-    return pd.read_csv(file_path)
+    return pd.read_csv(file_path, usecols=_column_filter(columns))
+
+
+def _column_filter(columns):
+    # A callable, unlike a list, does not fail on columns the file lacks
+    return None if columns is None else lambda column: column in columns
 
 # List all columns (besides "ID") that we want to compare
 COLUMNS_TO_COMPARE = [
@@ -32,6 +38,12 @@ COLUMNS_TO_COMPARE = [
     "Court's position",#"Court's Position",
 ]
 
+# The only columns the evaluation reads from the results file
+EVALUATION_COLUMNS = ["ID"] + COLUMNS_TO_COMPARE
+# The ground truths keep their "Original text", so that after the merge with the
+# inputs the decision texts are suffixed _x/_y as evaluate_g_eval() expects
+GROUND_TRUTH_COLUMNS = EVALUATION_COLUMNS + ["Original text"]
+
 def evaluate_results(inputs: pd.DataFrame, results_csv: str):
     """
     High-level function:
@@ -43,10 +55,10 @@ def evaluate_results(inputs: pd.DataFrame, results_csv: str):
     colorama.init(autoreset=True)
 
     # 1) Load ground truths (must have columns: ID + COLUMNS_TO_COMPARE)
-    gt_df = fetch_airtable_ground_truths()  
+    gt_df = fetch_airtable_ground_truths(columns=GROUND_TRUTH_COLUMNS)
 
     # 2) Load generated results (must have columns: ID + COLUMNS_TO_COMPARE)
-    results_df = pd.read_csv(results_csv)
+    results_df = pd.read_csv(results_csv, usecols=_column_filter(EVALUATION_COLUMNS))
 
     # Merge ground truths and results on ID
     merged_df = pd.merge(
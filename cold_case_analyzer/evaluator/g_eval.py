@@ -2,8 +2,10 @@ import os
 from datetime import datetime
 import pandas as pd
 from deepeval.metrics import GEval
+from deepeval.models import GPTModel
 from deepeval.test_case import LLMTestCase, LLMTestCaseParams
 from colorama import Fore, Style
+from llm_handler.clients import get_http_client, openai_api_key
 
 def evaluate_g_eval(merged_df, columns_to_compare):
     """
@@ -17,6 +19,14 @@ def evaluate_g_eval(merged_df, columns_to_compare):
     detailed_results = []
     original_texts = merged_df["Original text_y"].fillna("").tolist()
 
+    # One judge model for all metrics, sharing the pipeline's pooled HTTP client.
+    # async_mode=False keeps GEval on the synchronous (pooled) code path.
+    judge_model = GPTModel(
+        model="gpt-4o-mini-2024-07-18",
+        _openai_api_key=openai_api_key(),
+        http_client=get_http_client(),
+    )
+
     # Define unique metric configurations for each column.
     # Replace the placeholder evaluation steps and parameters with your specific details.
     column_metric_config = {
@@ -169,7 +179,8 @@ def evaluate_g_eval(merged_df, columns_to_compare):
                     name=metric_config["name"],
                     evaluation_steps=metric_config["evaluation_steps"],
                     evaluation_params=metric_config["evaluation_params"],
-                    model="gpt-4o-mini-2024-07-18"
+                    model=judge_model,
+                    async_mode=False,
                 )
                 metric.measure(test_case)
                 score_value = metric.score
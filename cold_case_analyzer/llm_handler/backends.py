@@ -0,0 +1,306 @@
+import abc
+import asyncio
+import contextlib
+import os
+import threading
+import time
+import weakref
+from llamaapi import LlamaAPI
+from config import LLAMA_API_KEY, LLM_BACKENDS, LLM_BACKEND_CONCURRENCY, LLM_RATE_LIMITS
+from llm_handler.clients import (
+    get_http_client,
+    get_openai_client,
+    get_async_openai_client,
+    openai_api_key,
+)
+from llm_handler.rate_limiter import scheduler
+from llm_handler.usage import record_usage
+from llm_handler.tracing import set_span_attributes
+
+
+class ModelBackend(abc.ABC):
+    """
+    Common interface of all model backends. `name` is the model name offered in the
+    CLI, `model_id` the id sent to the provider. At most `max_concurrency` requests
+    (None: unlimited) are in flight per backend, in threads and per event loop.
+    """
+
+    supports_json_mode = False
+    supports_json_schema = False
+    supports_logprobs = False
+    supports_streaming = False
+    supports_batch = False
+
+    def __init__(self, name, model_id, max_concurrency=None):
+        self.name = name
+        self.model_id = model_id
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._async_slots = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def capabilities(self):
+        return {
+            "json_mode": self.supports_json_mode,
+            "json_schema": self.supports_json_schema,
+            "logprobs": self.supports_logprobs,
+            "streaming": self.supports_streaming,
+            "batch": self.supports_batch,
+        }
+
+    def _slot(self):
+        return self._slots if self._slots is not None else contextlib.nullcontext()
+
+    def _async_slot(self):
+        if not self.max_concurrency:
+            return contextlib.nullcontext()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_slots.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._async_slots[loop] = semaphore
+            return semaphore
+
+    def _response_format(self, json_mode, json_schema):
+        """
+        Response format for the request. A requested JSON schema degrades to plain
+        JSON mode, or to free text, on backends that cannot enforce it; callers
+        validate the answer in any case.
+        """
+        if json_schema is not None:
+            if self.supports_json_schema:
+                return {"type": "json_schema", "json_schema": json_schema}
+            json_mode = self.supports_json_mode
+        if json_mode:
+            if not self.supports_json_mode:
+                raise ValueError(f"Model '{self.name}' does not support JSON mode")
+            return {"type": "json_object"}
+        return None
+
+    def prompt(self, prompt_text, json_mode=False, json_schema=None):
+        response_format = self._response_format(json_mode, json_schema)
+        start = time.perf_counter()
+        with self._slot():
+            set_span_attributes(**{"llm.slot_wait_s": round(time.perf_counter() - start, 4)})
+            return self._prompt(prompt_text, response_format)
+
+    async def aprompt(self, prompt_text, json_mode=False, json_schema=None):
+        response_format = self._response_format(json_mode, json_schema)
+        start = time.perf_counter()
+        async with self._async_slot():
+            set_span_attributes(**{"llm.slot_wait_s": round(time.perf_counter() - start, 4)})
+            return await self._aprompt(prompt_text, response_format)
+
+    @abc.abstractmethod
+    def _prompt(self, prompt_text, response_format):
+        """Sends one prompt and returns the answer text."""
+
+    async def _aprompt(self, prompt_text, response_format):
+        # Backends without an async client run the blocking call in a worker thread
+        return await asyncio.to_thread(self._prompt, prompt_text, response_format)
+
+    def chat_model(self, **kwargs):
+        """LangChain chat model for this backend (used by the LangGraph agents)."""
+        raise ValueError(f"Model '{self.name}' cannot be used as a LangChain chat model")
+
+
+class OpenAIBackend(ModelBackend):
+    """Chat completions through the shared OpenAI client, admitted and retried by the scheduler."""
+
+    supports_json_mode = True
+    supports_json_schema = True
+    supports_logprobs = True
+    supports_streaming = True
+    supports_batch = True
+
+    def __init__(self, name, model_id, max_concurrency=None, base_url=None, api_key=None):
+        super().__init__(name, model_id, max_concurrency)
+        self.base_url = base_url
+        self.api_key = api_key
+        # Limits are looked up by CLI model name, as in DEFAULT_RATE_LIMITS and LLM_RATE_LIMITS
+        self.rate_limit_key = name
+
+    def _request(self, prompt_text, response_format):
+        request = {
+            "model": self.model_id,
+            "temperature": 0,
+            "messages": [{"role": "user", "content": prompt_text}],
+        }
+        if response_format is not None:
+            request["response_format"] = response_format
+        return request
+
+    def _prompt(self, prompt_text, response_format):
+        client = get_openai_client(self.base_url, self.api_key)
+        request = self._request(prompt_text, response_format)
+        start_time = time.perf_counter()
+        raw_response = scheduler.run(
+            self.rate_limit_key,
+            prompt_text,
+            lambda: client.chat.completions.with_raw_response.create(**request),
+        )
+        completion = raw_response.parse()
+        record_usage(self.model_id, completion.usage, latency=time.perf_counter() - start_time)
+        return completion.choices[0].message.content
+
+    async def _aprompt(self, prompt_text, response_format):
+        client = get_async_openai_client(self.base_url, self.api_key)
+        request = self._request(prompt_text, response_format)
+        start_time = time.perf_counter()
+        raw_response = await scheduler.arun(
+            self.rate_limit_key,
+            prompt_text,
+            lambda: client.chat.completions.with_raw_response.create(**request),
+        )
+        completion = raw_response.parse()
+        record_usage(self.model_id, completion.usage, latency=time.perf_counter() - start_time)
+        return completion.choices[0].message.content
+
+    def chat_model(self, **kwargs):
+        # Imported here so that the CLI pipeline does not need LangChain
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=self.model_id,
+            base_url=self.base_url,
+            api_key=openai_api_key(self.api_key),
+            http_client=get_http_client(),
+            **kwargs,
+        )
+
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """
+    Self-hosted or third-party server speaking the OpenAI chat completions API
+    (vLLM, llama.cpp server, ...). Capabilities depend on the server and are set
+    per backend; there is no Batch API.
+    """
+
+    supports_batch = False
+
+    def __init__(
+        self,
+        name,
+        model_id,
+        base_url,
+        api_key=None,
+        max_concurrency=None,
+        json_mode=False,
+        json_schema=False,
+        logprobs=False,
+        streaming=True,
+        rate_limits=None,
+    ):
+        # Local servers ignore the key, but the OpenAI client requires one
+        super().__init__(name, model_id, max_concurrency, base_url, api_key or "EMPTY")
+        self.supports_json_mode = json_mode
+        self.supports_json_schema = json_schema
+        self.supports_logprobs = logprobs
+        self.supports_streaming = streaming
+        scheduler.set_limits(name, rate_limits)
+
+
+class LlamaBackend(ModelBackend):
+    """Llama models hosted by LlamaAPI (no async client, so async calls run in a thread)."""
+
+    def __init__(self, name, model_id, max_concurrency=None):
+        super().__init__(name, model_id, max_concurrency)
+        self.client = LlamaAPI(LLAMA_API_KEY)
+
+    def _prompt(self, prompt_text, response_format):
+        api_request_json = {
+            "model": self.model_id,
+            "messages": [{"role": "user", "content": prompt_text}],
+            "stream": False,
+            "temperature": 0,
+        }
+        response = self.client.run(api_request_json)
+        return response.json()["choices"][0]["message"]["content"]
+
+
+_registry = {}
+# Names of backends that only serve the agents and are not offered for case analysis
+_agent_only = set()
+
+
+def register_backend(backend, agent_only=False):
+    """
+    Adds (or replaces) a backend; it becomes selectable under `backend.name`, and
+    unless `agent_only` is listed among the case analysis models.
+    """
+    _registry[backend.name] = backend
+    if agent_only:
+        _agent_only.add(backend.name)
+    else:
+        _agent_only.discard(backend.name)
+    return backend
+
+
+def get_backend(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown model '{name}', available models: {', '.join(_registry)}"
+        ) from None
+
+
+def available_models():
+    """Models offered for case analysis (main.py), without the agent-only backends."""
+    return [name for name in _registry if name not in _agent_only]
+
+
+def backend_from_config(name, settings):
+    """
+    Builds an OpenAI-compatible backend from an LLM_BACKENDS entry, e.g.
+    {"base_url": "http://localhost:8000/v1", "model": "meta-llama/Llama-3.1-8B-Instruct",
+     "api_key_env": "VLLM_API_KEY", "max_concurrency": 8, "json_mode": true,
+     "json_schema": true, "logprobs": true, "rpm": 600, "tpm": 1000000}
+    Without rpm/tpm (here or in LLM_RATE_LIMITS) the endpoint is not rate limited
+    on the client side.
+    """
+    rate_limits = LLM_RATE_LIMITS.get(name)
+    if "rpm" in settings or "tpm" in settings:
+        rate_limits = {"rpm": settings.get("rpm", 10000), "tpm": settings.get("tpm", 10000000)}
+    api_key_env = settings.get("api_key_env")
+    return OpenAICompatibleBackend(
+        name,
+        settings.get("model", name),
+        settings["base_url"],
+        api_key=os.getenv(api_key_env) if api_key_env else None,
+        max_concurrency=settings.get("max_concurrency", LLM_BACKEND_CONCURRENCY.get(name)),
+        json_mode=settings.get("json_mode", False),
+        json_schema=settings.get("json_schema", False),
+        logprobs=settings.get("logprobs", False),
+        streaming=settings.get("streaming", True),
+        rate_limits=rate_limits,
+    )
+
+
+def _register_default_backends():
+    for name, model_id in [
+        ("gpt-4o", "gpt-4o"),
+        ("gpt-4o-mini", "gpt-4o-mini-2024-07-18"),
+    ]:
+        register_backend(OpenAIBackend(name, model_id, LLM_BACKEND_CONCURRENCY.get(name)))
+    register_backend(
+        LlamaBackend("llama3.1", "llama3.1-405b", LLM_BACKEND_CONCURRENCY.get("llama3.1"))
+    )
+    # Small model used by the LangGraph agent (cca_langgraph)
+    register_backend(
+        OpenAIBackend("gpt-4.1-nano", "gpt-4.1-nano", LLM_BACKEND_CONCURRENCY.get("gpt-4.1-nano")),
+        agent_only=True,
+    )
+    for name, settings in LLM_BACKENDS.items():
+        register_backend(backend_from_config(name, settings))
+    # A misspelt or provider-specific key would otherwise be ignored silently
+    unknown = [name for name in LLM_RATE_LIMITS if name not in _registry]
+    if unknown:
+        raise ValueError(
+            f"LLM_RATE_LIMITS has limits for unknown models {', '.join(unknown)}; "
+            f"use the model names {', '.join(_registry)}"
+        )
+
+
+_register_default_backends()
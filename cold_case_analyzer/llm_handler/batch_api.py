@@ -0,0 +1,240 @@
+import json
+import os
+import time
+import uuid
+from config import (
+    LLM_BATCH_DIR,
+    LLM_BATCH_POLL_INTERVAL,
+    LLM_BATCH_MAX_REQUESTS,
+    LLM_BATCH_MAX_BYTES,
+)
+from llm_handler.backends import get_backend
+from llm_handler.clients import get_openai_client
+from llm_handler.response_cache import response_cache, cache_model
+from llm_handler.usage import record_usage, record_call
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def batch_line(custom_id, model_id, prompt_text):
+    """One JSONL line of a batch input file, mirroring the body prompt_model sends."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model_id,
+            "temperature": 0,
+            "messages": [{"role": "user", "content": prompt_text}],
+        },
+    }
+
+
+def parse_output_line(line):
+    """
+    Returns (custom_id, content, usage) for one line of a batch output file;
+    content and usage are None for failed requests.
+    """
+    record = json.loads(line)
+    response = record.get("response") or {}
+    if record.get("error") or response.get("status_code") != 200:
+        return record["custom_id"], None, None
+    body = response["body"]
+    return record["custom_id"], body["choices"][0]["message"]["content"], body.get("usage")
+
+
+class OpenAIBatchBackend:
+    """Submits batch files to the OpenAI Batch API (24h completion window)."""
+
+    # Real model answers are stored in the response cache
+    caches_results = True
+
+    def submit(self, input_path):
+        client = get_openai_client()
+        with open(input_path, "rb") as file:
+            input_file = client.files.create(file=file, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        batch = get_openai_client().batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f"{counts.completed}/{counts.total}" if counts else ""
+        return batch.status, progress
+
+    def results(self, batch_id):
+        """{custom_id: (content, usage)} for all requests of a finished batch."""
+        client = get_openai_client()
+        batch = client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    custom_id, content, usage = parse_output_line(line)
+                    results[custom_id] = (content, usage)
+        return results
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the Batch API, so the batch flow runs without network.
+    Submitted files are copied into `root_dir/<batch_id>/` and answered on the
+    first status poll by `responder(custom_id, body)`; the default responder returns
+    a deterministic placeholder text.
+    """
+
+    # Stand-in answers must never end up in the response cache
+    caches_results = False
+
+    def __init__(self, root_dir, responder=None):
+        self.root_dir = root_dir
+        self.responder = responder or self.placeholder_response
+
+    @staticmethod
+    def placeholder_response(custom_id, body):
+        return f"[local batch response for {custom_id}]"
+
+    def _batch_dir(self, batch_id):
+        return os.path.join(self.root_dir, batch_id)
+
+    def submit(self, input_path):
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir)
+        with open(input_path, "r", encoding="utf-8") as source, open(
+            os.path.join(batch_dir, "input.jsonl"), "w", encoding="utf-8"
+        ) as target:
+            target.write(source.read())
+        return batch_id
+
+    def _process(self, batch_id):
+        batch_dir = self._batch_dir(batch_id)
+        with open(os.path.join(batch_dir, "input.jsonl"), "r", encoding="utf-8") as source, open(
+            os.path.join(batch_dir, "output.jsonl"), "w", encoding="utf-8"
+        ) as target:
+            for line in source:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = self.responder(request["custom_id"], request["body"])
+                output = {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                    },
+                    "error": None,
+                }
+                target.write(json.dumps(output) + "\n")
+
+    def status(self, batch_id):
+        if not os.path.exists(os.path.join(self._batch_dir(batch_id), "output.jsonl")):
+            self._process(batch_id)
+        return "completed", ""
+
+    def results(self, batch_id):
+        results = {}
+        with open(os.path.join(self._batch_dir(batch_id), "output.jsonl"), "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    custom_id, content, usage = parse_output_line(line)
+                    results[custom_id] = (content, usage)
+        return results
+
+
+def get_batch_backend(name):
+    if name == "openai":
+        return OpenAIBatchBackend()
+    if name == "local":
+        return LocalBatchBackend(os.path.join(LLM_BATCH_DIR, "local_backend"))
+    raise ValueError(f"Unknown batch backend '{name}', expected 'openai' or 'local'")
+
+
+def _split_into_files(lines, max_requests, max_bytes):
+    """Groups serialized lines so that no file exceeds the Batch API's size limits."""
+    part, size = [], 0
+    for line in lines:
+        line_size = len(line.encode("utf-8"))
+        if part and (len(part) >= max_requests or size + line_size > max_bytes):
+            yield part
+            part, size = [], 0
+        part.append(line)
+        size += line_size
+    if part:
+        yield part
+
+
+def run_batch(requests, model, backend, wave_name="wave"):
+    """
+    Runs `requests` ({custom_id: prompt_text}) for `model` through a batch backend and
+    returns {custom_id: response}. Prompts already in the response cache are not
+    submitted again, and fresh results of live backends are written back to the cache.
+    Custom ids of the form "<case id>|<stage>" are attributed to that case and stage
+    in the usage metrics.
+    """
+    model_backend = get_backend(model)
+    if not model_backend.supports_batch:
+        raise ValueError(f"Batch mode is only available for OpenAI models, not '{model}'")
+    model_id = model_backend.model_id
+    # Shared with the interactive calls of prompt_model
+    cache_id = cache_model(model_id)
+
+    results = {}
+    pending = {}
+    for custom_id, prompt_text in requests.items():
+        cached = response_cache.get(cache_id, prompt_text)
+        if cached is not None:
+            results[custom_id] = cached
+            case_id, _, stage = custom_id.rpartition("|")
+            record_call(model_id, cache_hit=True, batch=True, case_id=case_id or None, stage=stage)
+        else:
+            pending[custom_id] = prompt_text
+    print(f"{wave_name}: {len(results)} cached, {len(pending)} to submit")
+    if not pending:
+        return results
+
+    run_dir = os.path.join(LLM_BATCH_DIR, time.strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    lines = (
+        json.dumps(batch_line(custom_id, model_id, prompt_text))
+        for custom_id, prompt_text in pending.items()
+    )
+    batch_ids = []
+    for part_number, part in enumerate(
+        _split_into_files(lines, LLM_BATCH_MAX_REQUESTS, LLM_BATCH_MAX_BYTES), start=1
+    ):
+        input_path = os.path.join(run_dir, f"{wave_name}_{part_number}.jsonl")
+        with open(input_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(part) + "\n")
+        batch_id = backend.submit(input_path)
+        print(f"{wave_name}: submitted {input_path} as {batch_id}")
+        batch_ids.append(batch_id)
+
+    for batch_id in batch_ids:
+        while True:
+            status, progress = backend.status(batch_id)
+            if status in FINAL_STATUSES:
+                break
+            print(f"{wave_name}: batch {batch_id} is {status} {progress}")
+            time.sleep(LLM_BATCH_POLL_INTERVAL)
+        if status != "completed":
+            print(f"{wave_name}: batch {batch_id} ended with status '{status}'")
+        for custom_id, (content, usage) in backend.results(batch_id).items():
+            if custom_id in pending:
+                results[custom_id] = content
+                case_id, _, stage = custom_id.rpartition("|")
+                record_usage(model_id, usage, batch=True, case_id=case_id or None, stage=stage)
+                if backend.caches_results:
+                    response_cache.set(cache_id, pending[custom_id], content)
+
+    missing = [custom_id for custom_id in pending if results.get(custom_id) is None]
+    if missing:
+        print(f"{wave_name}: {len(missing)} requests returned no result")
+    return results
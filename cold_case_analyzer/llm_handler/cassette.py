@@ -0,0 +1,228 @@
+"""
+Record/replay of LLM traffic for deterministic, offline reruns.
+
+The shared httpx clients (llm_handler/clients.py) carry every OpenAI request of
+the CLI pipeline, the LangChain/LangGraph agents and the G-Eval judge. With
+LLM_CASSETTE_MODE=record their transport stores each request/response pair in a
+cassette (JSON lines, gzip-compressed if the path ends in .gz); with
+LLM_CASSETTE_MODE=replay the recorded responses are served without any network
+access, and a request that was never recorded fails with a 404 naming the stage,
+model and prompt hash. Requests are matched on the API path and the request body
+(model, messages, tools, ...), so a cassette recorded against one base URL
+replays against any other.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import httpx
+from config import LLM_CASSETTE_MODE, LLM_CASSETTE_PATH
+from llm_handler.usage import current_case_id, current_stage
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+# Responses that are retried rather than replayed
+TRANSIENT_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+# Headers that describe the original encoding of the body, which is stored decoded
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _json_body(content):
+    try:
+        return json.loads(content) if content else None
+    except ValueError:
+        return None
+
+
+def request_key(request):
+    """Match key of a request: hash over method, API path and the canonical JSON body."""
+    body = _json_body(request.content)
+    canonical = (
+        json.dumps(body, sort_keys=True, ensure_ascii=False)
+        if body is not None
+        else request.content.decode("utf-8", "replace")
+    )
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.url.path}\x00".encode("utf-8"))
+    digest.update(canonical.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _prompt_hash(body):
+    messages = (body or {}).get("messages")
+    encoded = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class Cassette:
+    """The request/response pairs of one cassette file."""
+
+    def __init__(self, path, mode):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}', expected 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+        if mode == "replay":
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cassette not found: {path}")
+            with _open(path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+            print(f"Replaying {len(self._entries)} recorded LLM responses from {path}")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, request, status_code, headers, content):
+        """Appends one request/response pair."""
+        body = _json_body(request.content)
+        response = _json_body(content)
+        choices = (response or {}).get("choices") or [{}]
+        entry = {
+            "key": request_key(request),
+            "case_id": current_case_id(),
+            "stage": current_stage(),
+            "model": (body or {}).get("model"),
+            "prompt_hash": _prompt_hash(body),
+            "status": status_code,
+            "completion": (choices[0].get("message") or {}).get("content"),
+            "usage": (response or {}).get("usage"),
+            "headers": {
+                name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS
+            },
+            "response": response if response is not None else content.decode("utf-8", "replace"),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with _open(self.path, "a") as file:
+                file.write(line)
+            self._entries[entry["key"]] = entry
+            self.recorded += 1
+
+    def replay(self, request):
+        """The recorded response to `request`, or a 404 response explaining the miss."""
+        entry = self._entries.get(request_key(request))
+        if entry is None:
+            body = _json_body(request.content)
+            message = (
+                f"No recorded response in cassette {self.path} for {request.method} "
+                f"{request.url.path} (stage {current_stage()}, case {current_case_id()}, "
+                f"model {(body or {}).get('model')}, prompt {_prompt_hash(body)})"
+            )
+            print(message)
+            with self._lock:
+                self.missed += 1
+            # 404 is not retried by the scheduler or the OpenAI client
+            return httpx.Response(
+                404,
+                json={"error": {"message": message, "type": "cassette_miss"}},
+                request=request,
+            )
+        with self._lock:
+            self.replayed += 1
+        response = entry["response"]
+        content = (
+            json.dumps(response, ensure_ascii=False) if not isinstance(response, str) else response
+        ).encode("utf-8")
+        return httpx.Response(
+            entry["status"], headers=entry["headers"], content=content, request=request
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "missed": self.missed,
+            }
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """Sync transport that records through `transport` or replays from `cassette`."""
+
+    def __init__(self, transport, cassette):
+        self._transport = transport
+        self._cassette = cassette
+
+    def handle_request(self, request):
+        if self._cassette.mode == "replay":
+            return self._cassette.replay(request)
+        response = self._transport.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        if response.status_code not in TRANSIENT_STATUS_CODES:
+            self._cassette.record(request, response.status_code, response.headers, content)
+        headers = [
+            (name, value) for name, value in response.headers.multi_items()
+            if name.lower() not in _DROPPED_HEADERS
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of CassetteTransport."""
+
+    def __init__(self, transport, cassette):
+        self._transport = transport
+        self._cassette = cassette
+
+    async def handle_async_request(self, request):
+        if self._cassette.mode == "replay":
+            return self._cassette.replay(request)
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        if response.status_code not in TRANSIENT_STATUS_CODES:
+            self._cassette.record(request, response.status_code, response.headers, content)
+        headers = [
+            (name, value) for name, value in response.headers.multi_items()
+            if name.lower() not in _DROPPED_HEADERS
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+_cassette_lock = threading.Lock()
+_cassette = None
+
+
+def get_cassette():
+    """The process-wide cassette, or None if LLM_CASSETTE_MODE is 'off'."""
+    global _cassette
+    if LLM_CASSETTE_MODE == "off":
+        return None
+    if LLM_CASSETTE_MODE not in CASSETTE_MODES:
+        raise ValueError(f"Unknown cassette mode '{LLM_CASSETTE_MODE}', expected one of {CASSETTE_MODES}")
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(LLM_CASSETTE_PATH, LLM_CASSETTE_MODE)
+        return _cassette
+
+
+def cassette_stats():
+    return _cassette.stats() if _cassette is not None else None
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_TIMEOUT,
+    OPENAI_CONNECT_TIMEOUT,
+    OPENAI_MAX_RETRIES,
+    LLM_CASSETTE_MODE,
+)
+from llm_handler.cassette import get_cassette, CassetteTransport, AsyncCassetteTransport
+
+# Process-wide client registry. Every OpenAI call (CLI pipeline, G-Eval judge,
+# LangGraph tools) goes through the same connection pool, so TLS handshakes and
+# keep-alive connections are reused instead of being rebuilt per request.
+# The sync clients are shared by all threads; async clients are bound to the
+# event loop that created them and are therefore kept per loop.
+# OpenAI-compatible endpoints (vLLM, llama.cpp, ...) get their own client per
+# base URL, but share the same pool.
+_client_lock = threading.Lock()
+_http_client = None
+_openai_clients = {}
+_async_http_clients = weakref.WeakKeyDictionary()
+_async_openai_clients = weakref.WeakKeyDictionary()
+
+
+# Key sent in replay mode when none is configured; the cassette never checks it
+REPLAY_API_KEY = "replay"
+
+
+def openai_api_key(api_key=None):
+    """`api_key`, else OPENAI_API_KEY, else in replay mode a placeholder (None otherwise)."""
+    if api_key:
+        return api_key
+    if OPENAI_API_KEY:
+        return OPENAI_API_KEY
+    return REPLAY_API_KEY if LLM_CASSETTE_MODE == "replay" else None
+
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _transport():
+    # Pooled transport, wrapped for recording/replaying if a cassette is active
+    transport = httpx.HTTPTransport(limits=_http_limits())
+    cassette = get_cassette()
+    return CassetteTransport(transport, cassette) if cassette else transport
+
+
+def _async_transport():
+    transport = httpx.AsyncHTTPTransport(limits=_http_limits())
+    cassette = get_cassette()
+    return AsyncCassetteTransport(transport, cassette) if cassette else transport
+
+
+def http_timeout():
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def get_http_client():
+    """Shared pooled httpx client, e.g. for ChatOpenAI(http_client=...)."""
+    global _http_client
+    with _client_lock:
+        if _http_client is None:
+            _http_client = DefaultHttpxClient(transport=_transport(), timeout=http_timeout())
+        return _http_client
+
+
+def get_async_http_client():
+    """Pooled httpx.AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            client = DefaultAsyncHttpxClient(transport=_async_transport(), timeout=http_timeout())
+            _async_http_clients[loop] = client
+        return client
+
+
+def get_openai_client(base_url=None, api_key=None):
+    """Shared OpenAI client (per base URL), safe to use from multiple threads."""
+    http_client = get_http_client()
+    with _client_lock:
+        client = _openai_clients.get(base_url)
+        if client is None:
+            client = OpenAI(
+                api_key=openai_api_key(api_key),
+                base_url=base_url,
+                max_retries=OPENAI_MAX_RETRIES,
+                timeout=http_timeout(),
+                http_client=http_client,
+            )
+            _openai_clients[base_url] = client
+        return client
+
+
+def get_async_openai_client(base_url=None, api_key=None):
+    """AsyncOpenAI client (per base URL) for the running event loop."""
+    loop = asyncio.get_running_loop()
+    http_client = get_async_http_client()
+    with _client_lock:
+        clients = _async_openai_clients.setdefault(loop, {})
+        client = clients.get(base_url)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=openai_api_key(api_key),
+                base_url=base_url,
+                max_retries=OPENAI_MAX_RETRIES,
+                timeout=http_timeout(),
+                http_client=http_client,
+            )
+            clients[base_url] = client
+        return client
+
+
+def close_clients():
+    """Closes the shared sync connection pool (async pools close with their loop)."""
+    global _http_client
+    with _client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _openai_clients.clear()
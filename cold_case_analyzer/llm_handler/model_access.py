@@ -1,50 +1,89 @@
-import subprocess
-from openai import OpenAI
-from config import OPENAI_API_KEY, LLAMA_API_KEY
-import json
-from llamaapi import LlamaAPI
-
-OpenAI.api_key = OPENAI_API_KEY
-llama = LlamaAPI(LLAMA_API_KEY)
-
-
-def prompt_model(prompt_text, model):
-    if model == "llama3.1":
-        return prompt_llama(prompt_text)
-    elif model == "gpt-4o":
-        return prompt_gpt_4o(prompt_text)
-    elif model == "gpt-4o-mini":
-        return prompt_gpt_4o_mini(prompt_text)
-    else:
-        return None
-
-
-def prompt_llama(prompt_text):
-    api_request_json = {
-        "model": "llama3.1-405b",
-        "messages": [{"role": "user", "content": prompt_text}],
-        "stream": False,
-        "temperature": 0,
-    }
-    response = llama.run(api_request_json)
-    parsed_response = json.dumps(response.json(), indent=2)
-    return parsed_response["choices"][0]["message"]["content"]
-
-
-def prompt_gpt_4o(prompt_text):
-    client = OpenAI()
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        temperature=0,
-        messages=[{"role": "user", "content": prompt_text}],
-    )
-    return completion.choices[0].message.content
-
-def prompt_gpt_4o_mini(prompt_text):
-    client = OpenAI()
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini-2024-07-18",
-        temperature=0,
-        messages=[{"role": "user", "content": prompt_text}],
-    )
-    return completion.choices[0].message.content
\ No newline at end of file
+import asyncio
+import threading
+import weakref
+from config import LLM_MAX_CONCURRENCY
+from llm_handler.backends import get_backend
+from llm_handler.response_cache import response_cache, cache_key, cache_model
+from llm_handler.single_flight import single_flight
+from llm_handler.usage import record_call
+from llm_handler.tracing import trace_span, set_span_attributes
+
+# Upper bound for concurrently awaited requests in aprompt_model (per event loop),
+# across all backends; each backend may additionally set its own limit.
+_concurrency_lock = threading.Lock()
+_max_concurrency = LLM_MAX_CONCURRENCY
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_max_concurrency(limit):
+    """Changes the number of requests aprompt_model keeps in flight at once."""
+    global _max_concurrency
+    if limit < 1:
+        raise ValueError("The concurrency limit must be at least 1")
+    with _concurrency_lock:
+        _max_concurrency = limit
+        _semaphores.clear()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    with _concurrency_lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(_max_concurrency)
+            _semaphores[loop] = semaphore
+        return semaphore
+
+
+def _span_attributes(model, json_schema):
+    return {"llm.backend": model, "llm.json_schema": json_schema["name"] if json_schema else None}
+
+
+def prompt_model(prompt_text, model, json_schema=None):
+    """
+    Sends the prompt to the registered backend `model`; raises ValueError for unknown
+    models. Identical prompts that are already in flight share that call.
+    `json_schema` ({"name": ..., "schema": ..., "strict": ...}) requests a structured
+    answer on backends that support it (see ModelBackend._response_format).
+    """
+    backend = get_backend(model)
+    cache_id = cache_model(backend.model_id, json_schema)
+    called = []
+
+    def call():
+        called.append(True)
+        cached = response_cache.get(cache_id, prompt_text)
+        if cached is not None:
+            record_call(backend.model_id, cache_hit=True, latency=0.0)
+            return cached
+        response = backend.prompt(prompt_text, json_schema=json_schema)
+        response_cache.set(cache_id, prompt_text, response)
+        return response
+
+    with trace_span(f"llm {model}", **_span_attributes(model, json_schema)):
+        response = single_flight.do(cache_key(cache_id, prompt_text), call)
+        set_span_attributes(**{"llm.deduplicated": not called})
+        return response
+
+
+async def aprompt_model(prompt_text, model, json_schema=None):
+    """Async counterpart of prompt_model; at most LLM_MAX_CONCURRENCY requests run at once."""
+    backend = get_backend(model)
+    cache_id = cache_model(backend.model_id, json_schema)
+    called = []
+
+    async def call():
+        called.append(True)
+        cached = response_cache.get(cache_id, prompt_text)
+        if cached is not None:
+            record_call(backend.model_id, cache_hit=True, latency=0.0)
+            return cached
+        async with _get_semaphore():
+            response = await backend.aprompt(prompt_text, json_schema=json_schema)
+        response_cache.set(cache_id, prompt_text, response)
+        return response
+
+    with trace_span(f"llm {model}", **_span_attributes(model, json_schema)):
+        response = await single_flight.ado(cache_key(cache_id, prompt_text), call)
+        set_span_attributes(**{"llm.deduplicated": not called})
+        return response
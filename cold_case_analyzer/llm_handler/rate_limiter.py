@@ -0,0 +1,314 @@
+import asyncio
+import random
+import re
+import threading
+import time
+import openai
+from config import (
+    LLM_RATE_LIMITS,
+    LLM_RATE_LIMIT_HEADROOM,
+    LLM_RATE_LIMIT_BURST_SECONDS,
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_CASSETTE_MODE,
+)
+from llm_handler.token_counting import count_tokens
+from llm_handler.tracing import set_span_attributes, add_span_event
+
+# Starting points for the per-model buckets (requests and tokens per minute),
+# keyed by the model names offered in the CLI. The buckets adapt as soon as the API reports the real limits in its
+# x-ratelimit-* headers, so these only matter for the first few requests.
+DEFAULT_RATE_LIMITS = {
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+FALLBACK_RATE_LIMIT = {"rpm": 500, "tpm": 30000}
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Parses OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds."""
+    if value is None:
+        return None
+    seconds = 0.0
+    matched = False
+    for amount, unit in _DURATION_PART.findall(str(value)):
+        seconds += float(amount) * _DURATION_UNITS[unit]
+        matched = True
+    if matched:
+        return seconds
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(headers):
+    """Server-suggested wait time from retry-after(-ms) headers, if any."""
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter; never shorter than a server-given retry-after."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute * headroom / 60` units per second.
+    Requests larger than the burst capacity are admitted once the bucket is full
+    and push it into deficit, so oversized prompts are delayed but never starved.
+    """
+
+    def __init__(self, per_minute):
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.set_limit(per_minute)
+        self.level = self.capacity
+
+    def set_limit(self, per_minute):
+        self.per_minute = per_minute
+        self.rate = per_minute * LLM_RATE_LIMIT_HEADROOM / 60
+        self.capacity = max(1.0, self.rate * LLM_RATE_LIMIT_BURST_SECONDS)
+        self.level = min(self.level, self.capacity)
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+
+class ModelRateLimiter:
+    """Admission control for one model: a request bucket (RPM) and a token bucket (TPM)."""
+
+    def __init__(self, rpm, tpm):
+        self._lock = threading.Lock()
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def try_acquire(self, tokens):
+        """Takes capacity for one request of `tokens` tokens, or returns the time to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait <= 0:
+                self.requests.level -= 1
+                self.tokens.level -= tokens
+            return wait
+
+    def acquire(self, tokens):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Adopts the limits and remaining budget reported by the API."""
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None and float(limit) != bucket.per_minute:
+                        bucket.set_limit(float(limit))
+                    if remaining is not None:
+                        bucket.refill(now)
+                        # Only ever lower the local estimate; refill raises it again.
+                        # Reserve the headroom share so we stay just below the quota.
+                        server_level = float(remaining) - bucket.per_minute * (1 - LLM_RATE_LIMIT_HEADROOM)
+                        bucket.level = min(bucket.level, server_level)
+                except ValueError:
+                    continue
+
+    def pause(self, seconds):
+        """Drains both buckets so that no request is admitted for `seconds` (used after a 429)."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            self.requests.level = min(self.requests.level, -seconds * self.requests.rate)
+            self.tokens.level = min(self.tokens.level, -seconds * self.tokens.rate)
+
+
+class UnlimitedRateLimiter:
+    """Limiter for endpoints without a client-side quota, e.g. a local vLLM server."""
+
+    def try_acquire(self, tokens):
+        return 0.0
+
+    def acquire(self, tokens):
+        pass
+
+    async def aacquire(self, tokens):
+        pass
+
+    def update_from_headers(self, headers):
+        pass
+
+    def pause(self, seconds):
+        pass
+
+
+class RequestScheduler:
+    """
+    Routes LLM requests through per-model rate limiters and retries transient
+    failures (429, 5xx, timeouts, connection errors) with jittered exponential backoff.
+    """
+
+    def __init__(self, rate_limits=None, max_retries=LLM_MAX_RETRIES):
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.max_retries = max_retries
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.rate_limited = 0
+
+    def set_limits(self, model, limits):
+        """Sets the limits ({"rpm": ..., "tpm": ...}) for `model`; None disables limiting."""
+        with self._lock:
+            self.rate_limits[model] = limits
+            self._limiters.pop(model, None)
+
+    def limiter(self, model):
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limits = self.rate_limits.get(model, FALLBACK_RATE_LIMIT)
+                # Replayed responses come from a local cassette, not from the API
+                if limits is None or LLM_CASSETTE_MODE == "replay":
+                    limiter = UnlimitedRateLimiter()
+                else:
+                    limiter = ModelRateLimiter(limits["rpm"], limits["tpm"])
+                self._limiters[model] = limiter
+            return limiter
+
+    def estimate_tokens(self, model, prompt_text):
+        return count_tokens(prompt_text, model) + LLM_EXPECTED_COMPLETION_TOKENS
+
+    def _on_error(self, limiter, error, attempt):
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        limiter.update_from_headers(headers)
+        delay = backoff_delay(attempt, retry_after_seconds(headers))
+        with self._lock:
+            self.retries += 1
+            if isinstance(error, openai.RateLimitError):
+                self.rate_limited += 1
+        if isinstance(error, openai.RateLimitError):
+            limiter.pause(delay)
+        print(f"{type(error).__name__} (attempt {attempt + 1}), retrying in {delay:.1f}s")
+        add_span_event("retry", error=type(error).__name__, attempt=attempt + 1, delay_s=delay)
+        return delay
+
+    @staticmethod
+    def _trace(attempt, queue_wait, network):
+        set_span_attributes(
+            **{
+                "llm.retries": attempt,
+                "llm.queue_wait_s": round(queue_wait, 4),
+                "llm.network_s": round(network, 4),
+            }
+        )
+
+    def run(self, model, prompt_text, send):
+        """
+        Calls `send()` once the model's budget admits the request and retries on
+        transient errors. `send` must return a raw response (with_raw_response),
+        whose headers are used to keep the buckets in sync with the API.
+        """
+        limiter = self.limiter(model)
+        tokens = self.estimate_tokens(model, prompt_text)
+        # Time spent waiting for budget/backoff vs. on requests, for tracing
+        queue_wait = network = 0.0
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            limiter.acquire(tokens)
+            sent = time.perf_counter()
+            queue_wait += sent - start
+            try:
+                raw_response = send()
+            except RETRYABLE_ERRORS as error:
+                network += time.perf_counter() - sent
+                if attempt == self.max_retries:
+                    self._trace(attempt, queue_wait, network)
+                    raise
+                delay = self._on_error(limiter, error, attempt)
+                time.sleep(delay)
+                queue_wait += delay
+                continue
+            network += time.perf_counter() - sent
+            self._trace(attempt, queue_wait, network)
+            limiter.update_from_headers(raw_response.headers)
+            return raw_response
+
+    async def arun(self, model, prompt_text, send):
+        """Async variant of run(); `send` is a coroutine function."""
+        limiter = self.limiter(model)
+        tokens = self.estimate_tokens(model, prompt_text)
+        queue_wait = network = 0.0
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            await limiter.aacquire(tokens)
+            sent = time.perf_counter()
+            queue_wait += sent - start
+            try:
+                raw_response = await send()
+            except RETRYABLE_ERRORS as error:
+                network += time.perf_counter() - sent
+                if attempt == self.max_retries:
+                    self._trace(attempt, queue_wait, network)
+                    raise
+                delay = self._on_error(limiter, error, attempt)
+                await asyncio.sleep(delay)
+                queue_wait += delay
+                continue
+            network += time.perf_counter() - sent
+            self._trace(attempt, queue_wait, network)
+            limiter.update_from_headers(raw_response.headers)
+            return raw_response
+
+    def stats(self):
+        with self._lock:
+            return {"retries": self.retries, "rate_limited": self.rate_limited}
+
+
+scheduler = RequestScheduler(LLM_RATE_LIMITS)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_MODE,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_AGE_DAYS,
+)
+
+# "use" reads and writes, "refresh" skips reads but stores the new answer,
+# "bypass" neither reads nor writes.
+CACHE_MODES = ("use", "refresh", "bypass")
+
+# Eviction is comparatively expensive, so it only runs every n-th write.
+EVICTION_INTERVAL = 100
+
+
+def cache_key(model, prompt_text):
+    """Content address of a request: hash over the model id and the full prompt."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt_text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_model(model_id, json_schema=None):
+    """
+    Model part of the cache key: the provider model id, plus a hash of the full
+    schema for structured answers, so that changing a schema invalidates its answers.
+    """
+    if json_schema is None:
+        return model_id
+    encoded = json.dumps(json_schema, sort_keys=True, ensure_ascii=False)
+    return f"{model_id}+schema:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache for LLM completions, keyed by cache_key().
+    Entries older than max_age_days are dropped, and once the table grows beyond
+    max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, mode="use", max_entries=None, max_age_days=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads, so keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _is_expired(self, created_at, now):
+        return self.max_age_days is not None and now - created_at > self.max_age_days * 86400
+
+    def get(self, model, prompt_text):
+        """Returns the cached response or None. Always None unless mode is 'use'."""
+        if self.mode != "use":
+            return None
+        key = cache_key(model, prompt_text)
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._is_expired(row[1], now):
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE responses SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key),
+                )
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else row[0]
+
+    def set(self, model, prompt_text, response):
+        """Stores a response unless the cache is bypassed."""
+        if self.mode == "bypass" or response is None:
+            return
+        key = cache_key(model, prompt_text)
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, model, response, now, now),
+            )
+        with self._lock:
+            self.writes += 1
+            run_eviction = self.writes % EVICTION_INTERVAL == 1
+        if run_eviction:
+            self.evict()
+
+    def evict(self):
+        """Applies the age and size limits. Returns the number of removed entries."""
+        removed = 0
+        with self._connection() as conn:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (cutoff,)
+                ).rowcount
+            if self.max_entries is not None:
+                removed += conn.execute(
+                    """
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                ).rowcount
+        return removed
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    LLM_CACHE_PATH,
+    mode=LLM_CACHE_MODE,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    max_age_days=LLM_CACHE_MAX_AGE_DAYS,
+)
+
+
+def set_cache_mode(mode):
+    """Switches the process-wide cache between 'use', 'refresh' and 'bypass'."""
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+    response_cache.mode = mode
+
+
+def cache_stats():
+    return response_cache.stats()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import weakref
+from llm_handler.response_cache import cache_key
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical requests into one upstream call. The first caller
+    for a key (the leader) runs the call; callers arriving while it is in flight wait
+    for it and receive the same result or exception. Nothing is kept once the call
+    has finished, so later identical requests go to the response cache as usual.
+    Threads and coroutines are tracked separately (coroutines per event loop).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, coroutine_function):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            if task is None:
+                task = loop.create_task(coroutine_function())
+                tasks[key] = task
+                task.add_done_callback(lambda _: tasks.pop(key, None))
+                self.calls += 1
+            else:
+                self.shared += 1
+        # Shielded, so that one cancelled caller does not cancel the call for everyone
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            total = self.calls + self.shared
+            return {
+                "upstream_calls": self.calls,
+                "deduplicated": self.shared,
+                "saved_ratio": self.shared / total if total else 0.0,
+            }
+
+
+single_flight = SingleFlight()
+
+
+def invoke_llm(llm, prompt):
+    """llm.invoke(prompt) for LangChain chat models, deduplicated across concurrent tool calls."""
+    model = getattr(llm, "model_name", None) or type(llm).__name__
+    return single_flight.do(cache_key(f"langchain:{model}", prompt), lambda: llm.invoke(prompt))
+
+
+def single_flight_stats():
+    return single_flight.stats()
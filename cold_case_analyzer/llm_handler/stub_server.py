@@ -0,0 +1,354 @@
+"""
+OpenAI-compatible stub server for offline load tests.
+
+Implements POST /v1/chat/completions (as used by the backends and ChatOpenAI) with
+configurable latency, token-rate simulation, 429/500 injection and server-side
+RPM/TPM limits. Answers are deterministic canned texts per pipeline stage; the
+stage is recognised from the instruction text of prompts/*.txt.
+
+Run from cold_case_analyzer/:
+    python -m llm_handler.stub_server --port 8089 --latency-mean 0.8 --error-429-rate 0.05
+
+and point the pipeline at it, either for the regular model names
+    OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=stub
+or as an additional backend
+    LLM_BACKENDS={"stub": {"base_url": "http://localhost:8089/v1"}}
+GET /stats returns the request, error and per-stage counters.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from aiohttp import web
+from llm_handler.token_counting import count_tokens
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts")
+
+STAGE_PROMPT_FILES = {
+    "col_section": "col_section.txt",
+    "abstract": "abstract.txt",
+    "relevant_facts": "facts.txt",
+    "rules_of_law": "rules.txt",
+    "classification": "issue_classification.txt",
+    "choice_of_law_issue": "issue.txt",
+    "courts_position": "position.txt",
+}
+
+DEFAULT_ANSWERS = {
+    "col_section": (
+        "The parties agreed that the contract shall be governed by Swiss law. "
+        "Under Art. 116 PILA, the choice of law made by the parties is valid."
+    ),
+    "abstract": (
+        "The court upheld the parties' express choice of Swiss law for their commercial "
+        "contract under Art. 116 PILA."
+    ),
+    "relevant_facts": (
+        "A Swiss and a German company concluded a licensing agreement containing a "
+        "choice of law clause in favour of Swiss law. A dispute arose over the validity "
+        "of the agreement."
+    ),
+    "rules_of_law": '["Art. 116 PILA", "Art. 117 PILA"]',
+    "classification": '"Party autonomy"',
+    "choice_of_law_issue": "Can the parties to an international contract choose the applicable law?",
+    "courts_position": (
+        "The parties' choice of law is to be respected unless mandatory provisions "
+        "of a closely connected jurisdiction require otherwise."
+    ),
+}
+FALLBACK_ANSWER = "This is a canned answer from the stub server."
+# Structured-output fields whose name differs from their stage
+SCHEMA_FIELD_STAGES = {"pil_provisions": "rules_of_law"}
+
+# Characteristic opening of each stage prompt, used to recognise the stage
+SIGNATURE_LENGTH = 80
+
+# Seconds start_in_background() waits for the server to listen
+STARTUP_TIMEOUT = 10
+
+
+def load_stage_signatures(prompts_dir=PROMPTS_DIR):
+    signatures = {}
+    for stage, filename in STAGE_PROMPT_FILES.items():
+        path = os.path.join(prompts_dir, filename)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                signatures[stage] = file.read().strip()[:SIGNATURE_LENGTH]
+    return signatures
+
+
+def detect_stage(prompt_text, signatures):
+    for stage, signature in signatures.items():
+        if signature and signature in prompt_text:
+            return stage
+    return None
+
+
+class Quota:
+    """Server-side per-minute budget, refilled continuously like the API's limits."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def seconds_until(self, amount):
+        return max(0.0, (amount - self.level) * 60 / self.per_minute)
+
+
+class StubServer:
+    def __init__(self, options):
+        self.options = options
+        self.signatures = load_stage_signatures()
+        self.answers = dict(DEFAULT_ANSWERS)
+        if options.answers:
+            with open(options.answers, "r", encoding="utf-8") as file:
+                self.answers.update(json.load(file))
+        self.requests_quota = Quota(options.rpm) if options.rpm else None
+        self.tokens_quota = Quota(options.tpm) if options.tpm else None
+        self._seen = {}
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "injected_429": 0,
+            "injected_500": 0,
+            "rate_limited": 0,
+            "per_stage": {},
+        }
+
+    def _rng(self, prompt_text):
+        # One generator per (prompt, attempt), so latencies and injected errors are
+        # reproducible independent of how concurrent requests interleave
+        digest = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+        attempt = self._seen.get(digest, 0)
+        self._seen[digest] = attempt + 1
+        return random.Random(f"{self.options.seed}:{digest}:{attempt}")
+
+    def _latency(self, rng):
+        mean = self.options.latency_mean
+        spread = self.options.latency_jitter
+        distribution = self.options.latency_dist
+        if distribution == "uniform":
+            value = rng.uniform(mean - spread, mean + spread)
+        elif distribution == "normal":
+            value = rng.gauss(mean, spread)
+        elif distribution == "lognormal":
+            # Parameterised by mean and standard deviation of the latency itself
+            variance = spread ** 2
+            sigma2 = max(1e-12, math.log(1 + variance / max(mean, 1e-9) ** 2))
+            mu = math.log(max(mean, 1e-9)) - sigma2 / 2
+            value = rng.lognormvariate(mu, sigma2 ** 0.5)
+        else:
+            value = mean
+        return max(0.0, value)
+
+    def _rate_limit_headers(self):
+        headers = {}
+        for quota, kind in ((self.requests_quota, "requests"), (self.tokens_quota, "tokens")):
+            if quota is None:
+                continue
+            headers[f"x-ratelimit-limit-{kind}"] = str(int(quota.per_minute))
+            headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, int(quota.level)))
+            headers[f"x-ratelimit-reset-{kind}"] = f"{quota.seconds_until(quota.per_minute):.3f}s"
+        return headers
+
+    def _admit(self, tokens):
+        """Returns the seconds to wait if the request exceeds the RPM/TPM quota, else takes it."""
+        wait = 0.0
+        for quota, amount in ((self.requests_quota, 1), (self.tokens_quota, tokens)):
+            if quota is not None:
+                quota.refill()
+                wait = max(wait, quota.seconds_until(amount))
+        if wait > 0:
+            return wait
+        if self.requests_quota is not None:
+            self.requests_quota.level -= 1
+        if self.tokens_quota is not None:
+            self.tokens_quota.level -= tokens
+        return 0.0
+
+    def _structured_answer(self, schema):
+        """Fills the schema's properties with the canned answer of the stage of the same name."""
+        answer = {}
+        for name, definition in schema.get("properties", {}).items():
+            text = self.answers.get(SCHEMA_FIELD_STAGES.get(name, name), FALLBACK_ANSWER)
+            if definition.get("type") == "array":
+                try:
+                    value = json.loads(text)
+                except ValueError:
+                    value = None
+                answer[name] = value if isinstance(value, list) else [text]
+            else:
+                answer[name] = text
+        return answer
+
+    @staticmethod
+    def _error(status, message, error_type, headers=None):
+        body = {"error": {"message": message, "type": error_type, "param": None, "code": None}}
+        return web.json_response(body, status=status, headers=headers)
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        prompt_text = "\n".join(str(message.get("content", "")) for message in messages)
+        model = body.get("model", "stub")
+        stage = detect_stage(prompt_text, self.signatures)
+        rng = self._rng(prompt_text)
+        self.stats["requests"] += 1
+
+        draw = rng.random()
+        if draw < self.options.error_429_rate:
+            self.stats["injected_429"] += 1
+            return self._error(
+                429, "Rate limit reached (injected by stub server)", "requests",
+                {"retry-after-ms": str(int(self.options.retry_after * 1000)), **self._rate_limit_headers()},
+            )
+        if draw < self.options.error_429_rate + self.options.error_500_rate:
+            self.stats["injected_500"] += 1
+            return self._error(500, "Internal server error (injected by stub server)", "server_error")
+
+        prompt_tokens = count_tokens(prompt_text, model)
+        answer = self.answers.get(stage, FALLBACK_ANSWER)
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            answer = json.dumps(self._structured_answer(response_format["json_schema"]["schema"]))
+        elif response_format.get("type") == "json_object":
+            answer = json.dumps({"stage": stage, "answer": answer})
+        completion_tokens = count_tokens(answer, model)
+
+        wait = self._admit(prompt_tokens + completion_tokens)
+        if wait > 0:
+            self.stats["rate_limited"] += 1
+            return self._error(
+                429, "Rate limit reached (stub server quota)", "tokens",
+                {"retry-after-ms": str(int(wait * 1000)), **self._rate_limit_headers()},
+            )
+
+        delay = self._latency(rng)
+        if self.options.tokens_per_second:
+            delay += completion_tokens / self.options.tokens_per_second
+        await asyncio.sleep(delay)
+
+        self.stats["completed"] += 1
+        per_stage = self.stats["per_stage"]
+        per_stage[str(stage)] = per_stage.get(str(stage), 0) + 1
+        response = {
+            "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "logprobs": None,
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0},
+            },
+        }
+        return web.json_response(response, headers=self._rate_limit_headers())
+
+    async def get_stats(self, request):
+        return web.json_response(self.stats)
+
+
+def create_app(options):
+    server = StubServer(options)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app["stub"] = server
+    for prefix in ("/v1", ""):
+        app.router.add_post(f"{prefix}/chat/completions", server.chat_completions)
+    app.router.add_get("/stats", server.get_stats)
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument(
+        "--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"], default="lognormal"
+    )
+    parser.add_argument("--latency-mean", type=float, default=1.0, help="Mean latency in seconds.")
+    parser.add_argument(
+        "--latency-jitter", type=float, default=0.3,
+        help="Half-width (uniform) or standard deviation (normal, lognormal) in seconds.",
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=0,
+        help="Simulated generation speed; adds completion_tokens / rate to the latency (0: off).",
+    )
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-500-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after sent with injected 429s.")
+    # Reported in x-ratelimit-* headers, so the client-side scheduler adopts them
+    parser.add_argument(
+        "--rpm", type=float, default=10000, help="Server-side requests per minute (0: unlimited)."
+    )
+    parser.add_argument(
+        "--tpm", type=float, default=30000000, help="Server-side tokens per minute (0: unlimited)."
+    )
+    parser.add_argument("--answers", help="JSON file mapping stage names to canned answers.")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def start_in_background(timeout=STARTUP_TIMEOUT, **overrides):
+    """
+    Starts the stub server in a daemon thread (for benchmark scripts) and returns
+    its base URL. Keyword arguments override the command line defaults,
+    e.g. start_in_background(port=8090, latency_mean=0.2). Errors while starting
+    (e.g. the port is in use) are raised here, and a TimeoutError if the server
+    does not listen within `timeout` seconds.
+    """
+    options = build_parser().parse_args([])
+    for name, value in overrides.items():
+        setattr(options, name, value)
+    started = threading.Event()
+    errors = []
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            runner = web.AppRunner(create_app(options))
+            loop.run_until_complete(runner.setup())
+            loop.run_until_complete(web.TCPSite(runner, options.host, options.port).start())
+        except BaseException as error:
+            errors.append(error)
+            loop.close()
+            return
+        finally:
+            started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    if not started.wait(timeout):
+        raise TimeoutError(f"Stub server did not start within {timeout}s")
+    if errors:
+        raise errors[0]
+    return f"http://{options.host}:{options.port}/v1"
+
+
+if __name__ == "__main__":
+    options = build_parser().parse_args()
+    print(f"Stub server listening on http://{options.host}:{options.port}/v1")
+    web.run_app(create_app(options), host=options.host, port=options.port, print=None)
@@ -0,0 +1,30 @@
+import functools
+import tiktoken
+
+# Fallback when no tiktoken encoding can be loaded (e.g. offline without a
+# cached BPE file): roughly four characters per token for European languages.
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text, model="gpt-4o"):
+    """Number of tokens `text` occupies for `model` (estimated if no encoding is available)."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,151 @@
+"""
+OpenTelemetry tracing of the analysis pipeline.
+
+Spans are opened for every case and stage (by usage_context()), every
+prompt_model() call and every LangGraph node. LLM calls carry the model, token
+counts, cache hits, retries and the time spent waiting for a rate-limit budget
+vs. on the network, so slow stages, models and cases can be found in the traces.
+Tracing is off unless TRACING_EXPORTERS names at least one exporter:
+  console  spans printed to stdout
+  file     one JSON span per line in TRACING_FILE
+  otlp     OTLP/gRPC exporter (needs opentelemetry-exporter-otlp-proto-grpc)
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from config import TRACING_EXPORTERS, TRACING_FILE
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+        SpanExportResult,
+    )
+except ImportError:
+    trace = None
+
+SERVICE_NAME = "cold-case-analyzer"
+
+_lock = threading.Lock()
+_tracer = None
+_initialized = False
+
+
+if trace is not None:
+
+    class JsonLinesSpanExporter(SpanExporter):
+        """Appends every finished span as one JSON line to `path`."""
+
+        def __init__(self, path):
+            self.path = path
+            self._lock = threading.Lock()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        def export(self, spans):
+            lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(lines)
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+def _build_exporter(name):
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        return JsonLinesSpanExporter(TRACING_FILE)
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("OTLP tracing requires opentelemetry-exporter-otlp-proto-grpc, skipping it")
+            return None
+        return OTLPSpanExporter()
+    print(f"Unknown tracing exporter '{name}', use console, file or otlp")
+    return None
+
+
+def get_tracer():
+    """The pipeline's tracer, or None if tracing is off (no exporters or no SDK)."""
+    global _tracer, _initialized
+    with _lock:
+        if _initialized:
+            return _tracer
+        _initialized = True
+        if not TRACING_EXPORTERS:
+            return None
+        if trace is None:
+            print("Tracing requires opentelemetry-sdk, continuing without traces")
+            return None
+        provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+        for name in TRACING_EXPORTERS:
+            exporter = _build_exporter(name)
+            if exporter is not None:
+                provider.add_span_processor(BatchSpanProcessor(exporter))
+        # Flush the spans still buffered when the run ends
+        atexit.register(provider.shutdown)
+        _tracer = provider.get_tracer(__name__)
+        return _tracer
+
+
+def _attributes(attributes):
+    # OpenTelemetry accepts str, bool, int and float values only
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
+
+
+@contextmanager
+def trace_span(name, **attributes):
+    """
+    Runs the block in a span named `name` (a no-op without tracing). Errors
+    raised in the block are recorded on the span.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=_attributes(attributes)) as span:
+        yield span
+
+
+def set_span_attributes(**attributes):
+    """Adds attributes to the current span, if one is being recorded."""
+    if trace is None:
+        return
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.set_attributes(_attributes(attributes))
+
+
+def add_span_event(name, **attributes):
+    """Adds an event (e.g. a retry) to the current span, if one is being recorded."""
+    if trace is None:
+        return
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.add_event(name, _attributes(attributes))
+
+
+def traced(name, function, **attributes):
+    """Wraps `function` so that each call runs in a span (used for LangGraph nodes)."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with trace_span(name, **attributes):
+            return function(*args, **kwargs)
+
+    return wrapper
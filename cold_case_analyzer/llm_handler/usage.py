@@ -0,0 +1,229 @@
+import contextvars
+import json
+import os
+import threading
+from contextlib import contextmanager
+from llm_handler.tracing import trace_span, set_span_attributes
+
+# USD per 1M tokens: (input, cached input, output). Batch API calls are billed at half price.
+MODEL_PRICING = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini-2024-07-18": (0.15, 0.075, 0.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+BATCH_DISCOUNT = 0.5
+
+_case_id = contextvars.ContextVar("case_id", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+
+_lock = threading.Lock()
+
+
+def _new_totals():
+    return {
+        "calls": 0,
+        "cache_hits": 0,
+        "prompt_tokens": 0,
+        "cached_tokens": 0,
+        "completion_tokens": 0,
+        "latency_s_total": 0.0,
+        "latency_s_max": None,
+        "cost_usd": 0.0,
+    }
+
+
+# Running totals instead of the call records, so memory does not grow with the corpus
+_run = _new_totals()
+_per_stage = {}
+_per_case = {}
+_unpriced_models = set()
+
+
+@contextmanager
+def usage_context(case_id=None, stage=None):
+    """
+    Attributes all LLM calls made inside the block to the given case and/or stage.
+    With tracing enabled the block also runs in a "case" or "stage <name>" span.
+    """
+    tokens = []
+    if case_id is not None:
+        tokens.append((_case_id, _case_id.set(case_id)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    span_name = f"stage {stage}" if stage is not None else "case"
+    try:
+        with trace_span(span_name, **{"cca.case_id": _case_id.get(), "cca.stage": stage}):
+            yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_case_id():
+    return _case_id.get()
+
+
+def current_stage():
+    return _stage.get()
+
+
+def cached_tokens_of(usage):
+    """Prompt tokens served from the provider's prompt cache (0 if not reported)."""
+    if isinstance(usage, dict):
+        details = usage.get("prompt_tokens_details") or {}
+        return details.get("cached_tokens") or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+
+def estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens, batch=False):
+    """Estimated USD cost of one call, or None for models without known pricing."""
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        return None
+    input_price, cached_price, output_price = pricing
+    cost = (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+def record_call(
+    model,
+    prompt_tokens=0,
+    completion_tokens=0,
+    cached_tokens=0,
+    latency=None,
+    cache_hit=False,
+    batch=False,
+    case_id=None,
+    stage=None,
+):
+    """Adds one call to the usage totals; case and stage default to the active usage_context()."""
+    record = {
+        "case_id": case_id if case_id is not None else _case_id.get(),
+        "stage": stage if stage is not None else _stage.get(),
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens,
+        "latency_s": latency,
+        "cost_usd": 0.0 if cache_hit else estimate_cost(
+            model, prompt_tokens, cached_tokens, completion_tokens, batch
+        ),
+        "cache_hit": cache_hit,
+        "batch": batch,
+    }
+    with _lock:
+        for totals in (
+            _run,
+            _per_stage.setdefault(str(record["stage"]), _new_totals()),
+            _per_case.setdefault(str(record["case_id"]), _new_totals()),
+        ):
+            _add(totals, record)
+        if record["cost_usd"] is None:
+            _unpriced_models.add(model)
+    set_span_attributes(
+        **{
+            "llm.model": model,
+            "llm.prompt_tokens": prompt_tokens,
+            "llm.cached_tokens": cached_tokens,
+            "llm.completion_tokens": completion_tokens,
+            "llm.cache_hit": cache_hit,
+            "llm.batch": batch,
+            "llm.cost_usd": record["cost_usd"],
+        }
+    )
+    return record
+
+
+def record_usage(model, usage, latency=None, batch=False, case_id=None, stage=None):
+    """Records a call from the `usage` block (object or dict) of a chat completion."""
+    if usage is None:
+        return record_call(model, latency=latency, batch=batch, case_id=case_id, stage=stage)
+    if isinstance(usage, dict):
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+    else:
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+    return record_call(
+        model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cached_tokens=cached_tokens_of(usage),
+        latency=latency,
+        batch=batch,
+        case_id=case_id,
+        stage=stage,
+    )
+
+
+def _add(totals, record):
+    totals["calls"] += 1
+    totals["cache_hits"] += 1 if record["cache_hit"] else 0
+    totals["prompt_tokens"] += record["prompt_tokens"]
+    totals["cached_tokens"] += record["cached_tokens"]
+    totals["completion_tokens"] += record["completion_tokens"]
+    latency = record["latency_s"]
+    if latency is not None:
+        totals["latency_s_total"] += latency
+        totals["latency_s_max"] = max(latency, totals["latency_s_max"] or 0.0)
+    # One call without known pricing makes the cost of the whole group unknown
+    if record["cost_usd"] is None or totals["cost_usd"] is None:
+        totals["cost_usd"] = None
+    else:
+        totals["cost_usd"] += record["cost_usd"]
+
+
+def _summary(totals):
+    prompt_tokens = totals["prompt_tokens"]
+    return {
+        **totals,
+        "cached_ratio": totals["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0,
+    }
+
+
+def reset_metrics():
+    with _lock:
+        _run.update(_new_totals())
+        _per_stage.clear()
+        _per_case.clear()
+        _unpriced_models.clear()
+
+
+def summarize_metrics():
+    """
+    Usage for the whole run, per stage and per case. cost_usd is None where a call
+    went to a model without known pricing (see unpriced_models).
+    """
+    with _lock:
+        return {
+            "run": _summary(_run),
+            "per_stage": {name: _summary(totals) for name, totals in _per_stage.items()},
+            "per_case": {name: _summary(totals) for name, totals in _per_case.items()},
+            "unpriced_models": sorted(_unpriced_models),
+        }
+
+
+def prompt_cache_stats():
+    """Token totals and the share of prompt tokens that hit the provider-side prompt cache."""
+    with _lock:
+        return {**_summary(_run), "unpriced_models": sorted(_unpriced_models)}
+
+
+def write_metrics(results_file):
+    """
+    Writes the run's usage totals (see summarize_metrics) next to a results CSV:
+    case_analysis_results_<...>.csv -> case_analysis_metrics_<...>.json
+    """
+    directory, file_name = os.path.split(results_file)
+    file_name = os.path.splitext(file_name)[0].replace(
+        "case_analysis_results_", "case_analysis_metrics_", 1
+    )
+    metrics_file = os.path.join(directory, f"{file_name}.json")
+    with open(metrics_file, "w", encoding="utf-8") as file:
+        json.dump(summarize_metrics(), file, indent=2, default=str)
+    return metrics_file
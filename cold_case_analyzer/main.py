@@ -1,45 +1,190 @@
 import os
+import argparse
 from datetime import datetime
 import pandas as pd
 import questionary
 from data_handler.airtable_retrieval import fetch_data
 from data_handler.airtable_concepts import fetch_and_prepare_concepts
-from data_handler.local_file_retrieval import fetch_local_data, fetch_local_concepts
-from case_analyzer import CaseAnalyzer
+from data_handler.local_file_retrieval import (
+    fetch_local_data,
+    fetch_local_concepts,
+    CASE_COLUMNS,
+    CONCEPT_COLUMNS,
+)
+from data_handler.result_sink import ResultSink, latest_sink_path
+from data_handler.case_source import stream_cases, iter_cases, iter_case_ids, count_cases
+from case_analyzer.case_runner import iter_case_results, iter_case_results_async
+from case_analyzer.batch_analysis import analyze_cases_in_batches
 from evaluator import evaluate_results
-from config import AIRTABLE_CD_TABLE
+from llm_handler.response_cache import cache_stats
+from llm_handler.rate_limiter import scheduler
+from llm_handler.batch_api import get_batch_backend
+from llm_handler.backends import available_models
+from llm_handler.single_flight import single_flight_stats
+from llm_handler.cassette import cassette_stats
+from case_analyzer.passage_retrieval import retrieval_stats
+from case_analyzer.stage_store import stage_store_stats
+from llm_handler.usage import prompt_cache_stats, write_metrics
+from config import (
+    AIRTABLE_CD_TABLE,
+    ASYNC_ANALYSIS,
+    CASE_ANALYSIS_WORKERS,
+    CASE_SOURCE_PATH,
+    FUSED_EXTRACTION,
+    STREAM_CASES,
+)
 
 
-def main_own_data(model_name):
-    
-    df = fetch_local_data()
-    concepts = fetch_local_concepts()
+def run_name(model_name, fused_extraction):
+    """Model name used in the result file names; fused runs are kept apart for A/B comparisons."""
+    fused = FUSED_EXTRACTION if fused_extraction is None else fused_extraction
+    return f"{model_name}_fused" if fused else model_name
 
-    print("Now starting the analysis...")
-    results = []
 
-    # Analyze each case
-    for i, (idx, text) in enumerate(df["Original text"].items(), start=1):
-        quote = df["Quote"].iloc[i - 1]
-        print(f"Now analyzing case {i}\n")
-        analyzer = CaseAnalyzer(text, quote, model_name, concepts)
-        analysis_results = analyzer.analyze()
+def open_result_sink(model_name, resume=None):
+    """
+    Returns the JSONL sink of this run. With `resume` ("latest" or a path) the
+    results of an earlier, interrupted run are continued.
+    """
+    output_folder = os.path.join(os.path.dirname(__file__), "data")
+    os.makedirs(output_folder, exist_ok=True)
+    path = None
+    if resume == "latest":
+        path = latest_sink_path(output_folder, model_name)
+        if path is None:
+            print(f"No earlier run found for {model_name}, starting a new one")
+    elif resume:
+        path = resume
+    if path is None:
+        # Define output path with date, time, and model in filename
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(output_folder, f"case_analysis_results_{timestamp}_{model_name}.jsonl")
+    else:
+        print(f"Resuming {path}")
+    return ResultSink(path)
 
-        # Append results to the list
-        results.append({"ID": df["ID"].iloc[idx], **analysis_results})
 
-    results_df = pd.DataFrame(results)
+def pending_cases(cases, sink):
+    """Drops the cases that already have complete results in the sink."""
+    completed = sink.completed_ids()
+    if completed:
+        print(f"Skipping {len(completed)} cases with complete results")
+    return [case for case in cases if str(case[0]) not in completed]
 
-    # Define output path with date, time, and model in filename
-    output_folder = os.path.join(os.path.dirname(__file__), "data")
-    os.makedirs(output_folder, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = os.path.join(
-        output_folder, f"case_analysis_results_{timestamp}_{model_name}.csv"
-    )
 
-    results_df.to_csv(output_file, index=False)
+def finalize_results(sink, ids):
+    """Writes the results CSV from the sink and prints the run statistics; returns the CSV path."""
+    output_file = os.path.splitext(sink.path)[0] + ".csv"
+    sink.finalize(output_file, ids)
     print(f"Results saved to {output_file}")
+    print(f"LLM response cache: {cache_stats()}")
+    print(f"LLM request scheduler: {scheduler.stats()}")
+    print(f"In-flight deduplication: {single_flight_stats()}")
+    retrieval = retrieval_stats()
+    if retrieval["full_tokens"]:
+        print(
+            f"Passage retrieval: {retrieval['context_tokens']} instead of {retrieval['full_tokens']} "
+            f"decision tokens sent to the later stages ({retrieval['saved_ratio']:.1%} saved)"
+        )
+    cassette = cassette_stats()
+    if cassette:
+        print(f"LLM cassette: {cassette}")
+    stages = stage_store_stats()
+    if stages:
+        print(f"Incremental analysis (reused/recomputed stages): {stages}")
+    usage = prompt_cache_stats()
+    cost = (
+        f"${usage['cost_usd']:.2f}" if usage["cost_usd"] is not None
+        else f"n/a (no pricing for {', '.join(usage['unpriced_models'])})"
+    )
+    print(
+        f"Provider prompt cache: {usage['cached_tokens']} of {usage['prompt_tokens']} "
+        f"prompt tokens cached ({usage['cached_ratio']:.1%})"
+    )
+    print(
+        f"LLM usage: {usage['calls']} calls, {usage['completion_tokens']} completion tokens, "
+        f"estimated cost {cost}"
+    )
+    print(f"Per-stage and per-case metrics saved to {write_metrics(output_file)}")
+    return output_file
+
+
+def run_analysis(
+    cases,
+    model_name,
+    concepts,
+    sink,
+    batch_backend=None,
+    workers=CASE_ANALYSIS_WORKERS,
+    fused_extraction=None,
+    incremental=None,
+    async_analysis=None,
+    total=None,
+):
+    """Analyzes `cases` ((case_id, text, quote) tuples) and appends the results to `sink`."""
+    async_analysis = ASYNC_ANALYSIS if async_analysis is None else async_analysis
+    if batch_backend is not None:
+        # Submit all cases stage by stage through the (asynchronous) Batch API
+        results = analyze_cases_in_batches(
+            [(case_id, text) for case_id, text, _ in cases],
+            model_name,
+            concepts,
+            get_batch_backend(batch_backend),
+        )
+        for result in results:
+            sink.append(result)
+    else:
+        # Analyze the cases concurrently; every finished case is stored right away
+        run_cases = iter_case_results_async if async_analysis else iter_case_results
+        for _, result in run_cases(
+            cases,
+            model_name,
+            concepts,
+            workers,
+            total=total,
+            fused_extraction=fused_extraction,
+            incremental=incremental,
+        ):
+            sink.append(result)
+
+
+def main_own_data(
+    model_name,
+    batch_backend=None,
+    workers=CASE_ANALYSIS_WORKERS,
+    resume=None,
+    fused_extraction=None,
+    incremental=None,
+    stream=None,
+    async_analysis=None,
+):
+    stream = STREAM_CASES if stream is None else stream
+    if stream and batch_backend is None:
+        main_streamed_data(
+            model_name, workers, resume, fused_extraction, incremental, async_analysis
+        )
+        return
+
+    df = fetch_local_data(columns=CASE_COLUMNS)
+    concepts = fetch_local_concepts(columns=CONCEPT_COLUMNS)
+    sink = open_result_sink(run_name(model_name, fused_extraction), resume)
+    cases = pending_cases(list(zip(df["ID"], df["Original text"], df["Quote"])), sink)
+
+    print("Now starting the analysis...")
+
+    run_analysis(
+        cases,
+        model_name,
+        concepts,
+        sink,
+        batch_backend,
+        workers,
+        fused_extraction,
+        incremental,
+        async_analysis,
+    )
+
+    output_file = finalize_results(sink, df["ID"])
 
     #print("Skipped all generation and using data from a previous iteration.")
     #output_file = "cold_case_analyzer/data/case_analysis_results_20250206_121810_gpt-4o.csv"
@@ -49,11 +194,66 @@ def main_own_data(model_name):
         evaluate_results(df, output_file)
 
 
-def main_airtable(model_name):
-    # Fetch data from Airtable
-    df = fetch_data(AIRTABLE_CD_TABLE)
+def main_streamed_data(
+    model_name,
+    workers=CASE_ANALYSIS_WORKERS,
+    resume=None,
+    fused_extraction=None,
+    incremental=None,
+    async_analysis=None,
+    source_path=CASE_SOURCE_PATH,
+):
+    """
+    Like main_own_data(), but reads the cases from `source_path` (.xlsx, .parquet
+    or .jsonl) as the workers need them instead of loading them all up front.
+    """
+    concepts = fetch_local_concepts(columns=CONCEPT_COLUMNS)
+    sink = open_result_sink(run_name(model_name, fused_extraction), resume)
+    completed = sink.completed_ids()
+    if completed:
+        print(f"Skipping {len(completed)} cases with complete results")
+    total = count_cases(source_path)
+    if total is not None:
+        total = max(total - len(completed), 0)
+
+    print(f"Now starting the analysis of the cases streamed from {source_path}...")
+    run_analysis(
+        stream_cases(source_path, skip_ids=completed),
+        model_name,
+        concepts,
+        sink,
+        workers=workers,
+        fused_extraction=fused_extraction,
+        incremental=incremental,
+        async_analysis=async_analysis,
+        total=total,
+    )
+    output_file = finalize_results(sink, iter_case_ids(source_path))
+
+    should_evaluate = questionary.select("Would you like to evaluate the results now?", choices=["Yes", "No"]).ask()
+    if should_evaluate == "Yes":
+        # G-Eval needs the decision texts; only now are they loaded at once
+        inputs = pd.DataFrame(
+            ((case_id, text) for case_id, text, _ in iter_cases(source_path)),
+            columns=["ID", "Original text"],
+        )
+        evaluate_results(inputs, output_file)
+
+
+def main_airtable(
+    model_name,
+    batch_backend=None,
+    workers=CASE_ANALYSIS_WORKERS,
+    resume=None,
+    fused_extraction=None,
+    incremental=None,
+    airtable_offline=None,
+    async_analysis=None,
+):
+    # Fetch data from Airtable (synced incrementally into the local mirror)
+    df = fetch_data(AIRTABLE_CD_TABLE, offline=airtable_offline)
+    concepts = fetch_and_prepare_concepts(offline=airtable_offline)
     #df.to_csv('cold_case_analyzer/data/raw/input.csv', index=False)
-    #concepts = fetch_and_prepare_concepts()
     #concepts.to_csv('cold_case_analyzer/data/raw/concepts.csv', index=False)
 
     # Filter out cases missing key information
@@ -63,12 +263,15 @@ def main_airtable(model_name):
     #df = df.iloc[0:3]
     print("Length of df: ", len(df))
 
+    # Records without an "ID" field are identified by their citation
+    id_column = "ID" if "ID" in df.columns else "Case Citation"
+
     print("Writing df as ground truths to storage")
     gt_output_folder = os.path.join(os.path.dirname(__file__), "data", "raw")
     os.makedirs(gt_output_folder, exist_ok=True)
     gt_output_file = os.path.join(gt_output_folder, "ground_truths.csv")
     # keep only the columns "Case Citation", "Jurisdictions", "Abstract", "Relevant Facts", "PIL Provisions", "Themes", "Choice of Law Issue", "Court's Position"
-    df = df[[
+    ground_truth_columns = [
         "Case Citation",
         "Jurisdictions",
         "Abstract",
@@ -77,54 +280,134 @@ def main_airtable(model_name):
         "Themes",
         "Choice of Law Issue",
         "Court's Position"
-    ]]
-    df.to_csv(gt_output_file, index=False)
-    """
-    print("Now starting the analysis...")
-    results = []
+    ]
+    if id_column == "ID":
+        ground_truth_columns.insert(0, "ID")
+    df[ground_truth_columns].to_csv(gt_output_file, index=False)
 
-    # Analyze each case
-    for idx, row in df.iterrows():
-        text = row['Original text']
-        quote = row['Quote']
-        print(f"Now analyzing case {idx}\n")
-        analyzer = CaseAnalyzer(text, quote, model_name, concepts)
-        analysis_results = analyzer.analyze()
-
-        results.append({"ID": row['ID'], **analysis_results})
-
-    results_df = pd.DataFrame(results)
-
-    output_folder = os.path.join(os.path.dirname(__file__), "data")
-    os.makedirs(output_folder, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = os.path.join(
-        output_folder, f"case_analysis_results_{timestamp}_{model_name}.csv"
+    print("Now starting the analysis...")
+    sink = open_result_sink(run_name(model_name, fused_extraction), resume)
+    quotes = df["Quote"] if "Quote" in df.columns else [None] * len(df)
+    cases = pending_cases(list(zip(df[id_column], df["Original Text"], quotes)), sink)
+    run_analysis(
+        cases,
+        model_name,
+        concepts,
+        sink,
+        batch_backend,
+        workers,
+        fused_extraction,
+        incremental,
+        async_analysis,
     )
+    output_file = finalize_results(sink, df[id_column])
 
-    results_df.to_csv(output_file, index=False)
-    print(f"Results saved to {output_file}")
-    
     should_evaluate = questionary.select("Would you like to evaluate the results now?", choices=["Yes", "No"]).ask()
     if should_evaluate == "Yes":
-        evaluate_results(df, output_file)
-    """
+        inputs = df.rename(columns={id_column: "ID", "Original Text": "Original text"})
+        evaluate_results(inputs, output_file)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold Case Analyzer")
+    parser.add_argument(
+        "--batch-mode",
+        action="store_true",
+        help="Run all LLM stages through the asynchronous Batch API (OpenAI models only).",
+    )
+    parser.add_argument(
+        "--batch-backend",
+        choices=["openai", "local"],
+        default="openai",
+        help="Batch backend; 'local' is a file-based stand-in that needs no network.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=CASE_ANALYSIS_WORKERS,
+        help="Number of cases analyzed concurrently (default: CASE_ANALYSIS_WORKERS or 8).",
+    )
+    parser.add_argument(
+        "--fused-extraction",
+        action="store_true",
+        default=None,
+        help="Extract abstract, relevant facts and PIL provisions in one structured call "
+        "(default: FUSED_EXTRACTION); not used in batch mode.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=None,
+        help="Reuse stored stage outputs whose inputs (decision, prompt, model, upstream "
+        "stages) are unchanged and recompute only the rest (default: INCREMENTAL_ANALYSIS); "
+        "not used in batch mode.",
+    )
+    parser.add_argument(
+        "--async-analysis",
+        action="store_true",
+        default=None,
+        help="Run the cases as tasks on one event loop with the async LLM API instead of "
+        "worker threads (default: ASYNC_ANALYSIS); not used in batch mode.",
+    )
+    parser.add_argument(
+        "--stream-cases",
+        action="store_true",
+        default=None,
+        help="Own data: read the cases from CASE_SOURCE_PATH (.xlsx, .parquet or .jsonl) one at a "
+        "time instead of loading them all (default: STREAM_CASES); not used in batch mode.",
+    )
+    parser.add_argument(
+        "--airtable-offline",
+        action="store_true",
+        default=None,
+        help="Read the Airtable tables from the local mirror without contacting Airtable "
+        "(default: AIRTABLE_OFFLINE).",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        metavar="RESULTS_JSONL",
+        help="Continue an interrupted run (default: the latest run of the selected model); "
+        "cases with complete results are skipped.",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
     data_source = questionary.select(
         "Select your data source (for most use cases, you likely want to select 'Own data'):",
         choices=["Own data", "Airtable"],
     ).ask()
 
     model_choice = questionary.select(
-        "Select the model:", choices=["gpt-4o", "gpt-4o-mini", "llama3.1"]
+        "Select the model:", choices=available_models()
     ).ask()
 
     if data_source == "Own data":
-        main_own_data(model_choice)
+        main_own_data(
+            model_choice,
+            batch_backend=args.batch_backend if args.batch_mode else None,
+            workers=args.workers,
+            resume=args.resume,
+            fused_extraction=args.fused_extraction,
+            incremental=args.incremental,
+            stream=args.stream_cases,
+            async_analysis=args.async_analysis,
+        )
     elif data_source == "Airtable":
-        main_airtable(model_choice)
+        main_airtable(
+            model_choice,
+            batch_backend=args.batch_backend if args.batch_mode else None,
+            workers=args.workers,
+            resume=args.resume,
+            fused_extraction=args.fused_extraction,
+            incremental=args.incremental,
+            airtable_offline=args.airtable_offline,
+            async_analysis=args.async_analysis,
+        )
     else:
         print("No valid option selected. Exiting.")
 